@@ -23,4 +23,11 @@ LOG_LEVEL = "INFO"  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
 # Execution defaults (can be overridden per strategy)
 DEFAULT_SLIPPAGE = 0.01
 DEFAULT_INITIAL_CAPITAL = 100000
-DEFAULT_RPT = 0.01  # Risk per trade
\ No newline at end of file
+DEFAULT_RPT = 0.01  # Risk per trade
+DEFAULT_EXECUTION_MODEL = "simple_avg"  # Options: simple_avg, fixed_tick, range_pct, volume_impact (see Execution.MODELS)
+DEFAULT_TICK_SIZE = 0.05  # Minimum price move, used by the fixed_tick model
+DEFAULT_SPREAD_TICKS = 1  # Ticks paid away from the open per fill, used by the fixed_tick model
+DEFAULT_RANGE_PCT = 0.1  # Fraction of the high-low range paid per fill, used by the range_pct model
+
+# Parallelism
+DEFAULT_NUM_WORKERS = os.cpu_count() or 1  # Worker processes used to load/preprocess days (1 means no process pool)
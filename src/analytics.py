@@ -6,12 +6,17 @@ import os
 import numpy as np
 from functools import reduce ##reduce will help us club multiple filters together
 import operator
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure ##Charts are drawn on Figure objects with the Agg canvas directly, no global pyplot state (safe in worker processes and threads)
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import time
+from concurrent.futures import ProcessPoolExecutor ##For rendering many reports in parallel
 ##Following imports are for generating the nice pdf report
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+from reportlab.graphics.shapes import Drawing, String, Line ##For the vector charts (chart_format="vector")
+from reportlab.graphics.charts.lineplots import LinePlot
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from pathlib import Path
@@ -21,6 +26,297 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+##Nanoseconds in a day, durations are whole days (floor) the same way a pandas Timedelta gives .days
+NS_PER_DAY = 24*60*60*10**9
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        equity (Numpy float64 array): equity curve, 1-D, or 2-D with one curve per row (for e.g. gross/execution/net), NaN where there is no value
+        times (Array like): one timestamp per column of equity, dates or intraday timestamps (anything pd.to_datetime takes), in time order
+    Outputs: scan (Dictionary) with the following keys (per row arrays have one value per curve, they are single values for a 1-D equity):
+        peak (Numpy float64 array): running maximum of equity (NaN skipped), same shape as equity
+        drawdown (Numpy float64 array): (equity - peak)/peak, same shape as equity
+        in_dd (Numpy bool array): True where equity is below its peak, same shape as equity
+        dd_days (Numpy int64 array): days since the first point of the drawdown we are in, 0 outside of a drawdown, same shape as equity
+        max_duration_days (Numpy int64 array): per row, longest drawdown (last date in it - first date in it)
+        current_duration_days (Numpy int64 array): per row, days of the drawdown the curve ends in, 0 if it ends at a peak
+        max_recovery_days (Numpy float64 array): per row, longest time from a trough back to the peak, NaN if no drawdown has recovered yet
+        episodes (Pandas DF): one row per drawdown, with columns
+            row (Int) - curve it belongs to
+            peak, start, trough, end, recovery (Pandas Timestamp) - last peak before it, first and last point below the peak, lowest point, first point back at the peak (NaT if not recovered)
+            depth_pct (Float) - drawdown at the trough, such as -0.12
+            duration_days (Int) - end - start, same definition as max_drawdown_duration_days
+            recovery_days (Float) - recovery - trough, NaN if not recovered
+            points (Int) - number of points below the peak
+Purpose: To find every drawdown of one or many equity curves in one linear pass over the arrays (no groupby), it works the same for daily and minute level curves
+    A NaN point is never in a drawdown, so it closes the drawdown it is in (same as the groupby version did)
+"""
+def drawdown_scan(equity, times):
+    equity = np.asarray(equity, dtype=np.float64)
+    single = equity.ndim == 1
+    equity = np.atleast_2d(equity)
+    rows, n = equity.shape
+    times = pd.to_datetime(pd.Series(np.asarray(times))).values.astype("datetime64[ns]").astype(np.int64)
+    positions = np.arange(n)
+    peak = np.fmax.accumulate(equity, axis=1) ##fmax skips NaN the same way cummax does
+    peak[np.isnan(equity)] = np.nan
+    drawdown = (equity - peak)/peak
+    in_dd = equity < peak
+    ##Drawdowns are the runs of in_dd, a False column on both sides of every row makes each run start with +1 and end with -1 in the diff
+    edges = np.diff(np.pad(in_dd.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    episode_rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1] ##Exclusive, nonzero walks row by row so starts and ends pair up
+    latest_start = np.maximum.accumulate(np.where(edges[:, :n] == 1, positions, 0), axis=1)
+    dd_days = np.where(in_dd, (times[positions] - times[latest_start]) // NS_PER_DAY, 0)
+    last_peak = np.maximum.accumulate(np.where(equity == peak, positions, 0), axis=1)
+    ##Depth of every run with one reduceat over the flattened drawdown, the trough is the first point of the run at that depth
+    flat_drawdown, flat_starts = np.append(drawdown.ravel(), np.nan), episode_rows*n + starts
+    depths = np.fmin.reduceat(flat_drawdown, np.stack([flat_starts, episode_rows*n + ends], axis=1).ravel())[::2] if len(starts) else np.zeros(0)
+    episode_of = np.cumsum(np.bincount(flat_starts, minlength=rows*n)) - 1
+    at_depth = np.flatnonzero(in_dd.ravel() & (flat_drawdown[:-1] == depths[np.maximum(episode_of, 0)])) if len(starts) else np.zeros(0, dtype=np.int64)
+    troughs = at_depth[np.r_[True, np.diff(episode_of[at_depth]) != 0]] - episode_rows*n if len(starts) else starts
+    ##Recovered if the point right after the run is back at its peak (so not the end of the curve, nor a NaN)
+    after = np.minimum(ends, n - 1)
+    recovered = (ends < n) & (equity[episode_rows, after] >= peak[episode_rows, after])
+    duration_days = (times[ends - 1] - times[starts]) // NS_PER_DAY
+    recovery_days = np.where(recovered, (times[after] - times[troughs]) // NS_PER_DAY, np.nan)
+    max_duration_days, max_recovery_days = np.zeros(rows, dtype=np.int64), np.full(rows, np.nan)
+    np.maximum.at(max_duration_days, episode_rows, duration_days)
+    np.fmax.at(max_recovery_days, episode_rows, recovery_days)
+    timestamps = lambda values, valid=True: pd.to_datetime(np.where(valid, values, np.iinfo(np.int64).min).astype("datetime64[ns]"))
+    episodes = pd.DataFrame({"row": episode_rows, "peak": timestamps(times[last_peak[episode_rows, starts]]), "start": timestamps(times[starts]),
+                             "trough": timestamps(times[troughs]), "end": timestamps(times[ends - 1]), "recovery": timestamps(times[after], recovered),
+                             "depth_pct": depths, "duration_days": duration_days, "recovery_days": recovery_days, "points": ends - starts})
+    scan = {"peak": peak, "drawdown": drawdown, "in_dd": in_dd, "dd_days": dd_days, "max_duration_days": max_duration_days,
+            "current_duration_days": dd_days[:, -1] if n else np.zeros(rows, dtype=np.int64), "max_recovery_days": max_recovery_days, "episodes": episodes}
+    if single:
+        scan.update({key: scan[key][0] for key in ["peak", "drawdown", "in_dd", "dd_days", "max_duration_days", "current_duration_days", "max_recovery_days"]})
+    return scan
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+##Columns of batch_metrics, the Metrics statistic of the same name (or max_drawdown_duration_days etc.) for every run
+BATCH_METRICS = ["total_trades", "total_return_pct", "cagr_return_pct", "max_drawdown_pct", "calmar_ratio", "sharpe_ratio", "sortino_ratio",
+                 "max_drawdown_duration_days", "current_drawdown_days", "max_recovery_days", "winrate_pct", "largest_win_pct", "largest_loss_pct",
+                 "avg_win_pct", "avg_loss_pct", "expectancy_pct"]
+
+"""
+Signature:
+    Inputs:
+        pnl_panel (Numpy 2-D array/Pandas DF): pnl of many backtests stacked, one row per run and one column per date, NaN where a run has no pnl that day
+            A DF keeps its index as the run ids
+        dates (Array like): one date (or intraday timestamp) per column, in time order, shared by every run
+        initial_capital (Float): same as Metrics
+        annual_risk_free_rate (Float): Optional argument - same as Metrics.sharpe_ratio, 0 by default
+        target_return (Float): Optional argument - same as Metrics.sortino_ratio, 0 by default
+        run_ids (Array like): Optional argument - one id per run for the index of the output, 0..runs-1 by default (or the index of the DF)
+    Outputs:
+        df_batch (Pandas DF): one row per run, one column per name in BATCH_METRICS
+Purpose: To compute the Metrics statistics of thousands of backtests at once (for sweeps and robustness studies) without building a Metrics object, or a chart, per run
+    Every statistic is a 2-D array operation across all the runs, every run gives the same numbers as the gross column of Metrics on a df_results with that pnl
+    (the last digit can differ as the sums are done across all runs at once)
+"""
+def batch_metrics(pnl_panel, dates, initial_capital, annual_risk_free_rate=0, target_return=0, run_ids=None):
+    if initial_capital == 0:
+        logger.error("Initial capital cannot be 0")
+        raise ValueError("Initial capital cannot be 0")
+    if run_ids is None and isinstance(pnl_panel, pd.DataFrame):
+        run_ids = pnl_panel.index
+    pnl = np.ascontiguousarray(np.atleast_2d(np.asarray(pnl_panel, dtype=np.float64)))
+    if pnl.shape[1] != len(dates):
+        logger.error(f"pnl_panel has {pnl.shape[1]} columns but {len(dates)} dates were passed")
+        raise ValueError(f"pnl_panel has {pnl.shape[1]} columns but {len(dates)} dates were passed")
+    valid = ~np.isnan(pnl)
+    filled = np.where(valid, pnl, 0)
+    trades = valid.sum(axis=1)
+    equity = initial_capital + np.cumsum(filled, axis=1)
+    equity[~valid] = np.nan
+    scan = drawdown_scan(equity, dates)
+    times = pd.to_datetime(pd.Series(np.asarray(dates))).values.astype("datetime64[ns]").astype(np.int64)
+    years = ((times.max() - times.min()) // NS_PER_DAY)/365.25 if len(times) else np.nan
+    total = filled.sum(axis=1)
+    returns = pnl/initial_capital
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ##Returns
+        total_return_pct = total/initial_capital
+        cagr_return_pct = ((initial_capital + total)/initial_capital)**(1/years) - 1
+        ##Risk, trades per year as Metrics does it (trades with a pnl for sharpe, every row for sortino)
+        max_drawdown_pct = np.fmin.reduce(scan["drawdown"], axis=1, initial=np.nan)
+        mean, std = _batch_mean_std(returns, valid)
+        trades_per_year = trades/years
+        risk_free_per_trade = annual_risk_free_rate/trades_per_year if annual_risk_free_rate != 0 else 0
+        sharpe_ratio = (mean - risk_free_per_trade)/std*np.sqrt(trades_per_year)
+        downside_std = _batch_mean_std(returns, returns < target_return)[1]
+        sortino_ratio = (mean - target_return)/downside_std*np.sqrt(pnl.shape[1]/years)
+        ##Win/loss
+        avg_win_pct = _batch_mean_std(pnl, pnl > 0)[0]/initial_capital
+        avg_loss_pct = _batch_mean_std(pnl, pnl <= 0)[0]/initial_capital
+        winrate_pct = (pnl > 0).sum(axis=1)/trades
+        columns = {"total_trades": trades, "total_return_pct": total_return_pct, "cagr_return_pct": cagr_return_pct, "max_drawdown_pct": max_drawdown_pct,
+                   "calmar_ratio": cagr_return_pct/np.abs(max_drawdown_pct), "sharpe_ratio": sharpe_ratio, "sortino_ratio": sortino_ratio,
+                   "max_drawdown_duration_days": scan["max_duration_days"], "current_drawdown_days": scan["current_duration_days"],
+                   "max_recovery_days": scan["max_recovery_days"], "winrate_pct": winrate_pct,
+                   "largest_win_pct": np.fmax.reduce(pnl, axis=1, initial=np.nan)/initial_capital,
+                   "largest_loss_pct": np.fmin.reduce(pnl, axis=1, initial=np.nan)/initial_capital,
+                   "avg_win_pct": avg_win_pct, "avg_loss_pct": avg_loss_pct, "expectancy_pct": _expectancy(avg_win_pct, avg_loss_pct, winrate_pct)}
+    df_batch = pd.DataFrame(columns, columns=BATCH_METRICS, index=pd.RangeIndex(len(pnl), name="run") if run_ids is None else run_ids)
+    return df_batch
+
+##Private helper for batch_metrics - mean and sample standard deviation of every row over the points where mask is True (NaN if there are none/fewer than 2)
+def _batch_mean_std(values, mask):
+    count = mask.sum(axis=1)
+    mean = np.where(mask, values, 0).sum(axis=1)/count
+    std = np.sqrt(np.where(mask, (mean[:, None] - values)**2, 0).sum(axis=1)/(count - 1))
+    return mean, np.where(count < 2, np.nan, std)
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+##Columns of rolling_metrics, every value is the statistic of the same name over the window ending at that date (trades is the number of trades in the window)
+ROLLING_METRICS = ["trades", "sharpe_ratio", "sortino_ratio", "winrate_pct", "max_drawdown_pct", "expectancy_pct"]
+
+"""
+Signature:
+    Inputs:
+        pnl_panel, dates, initial_capital, annual_risk_free_rate, target_return, run_ids: same as batch_metrics (a single pnl series works too)
+        window (Int/String): Optional argument - what every date looks back over
+            Int - the last window trades, such as 60, only dates where the run has a pnl count as trades (NaN gaps of a run do not shrink its window)
+            String - a calendar window pandas understands as a Timedelta, such as "90D" (the trades after date - window, up to date)
+            None (default) - every trade up to date (expanding)
+        min_trades (Int): Optional argument - dates whose window has fewer trades are NaN, by default the window itself for a trade window (so the first window-1 dates of a run are NaN) and 2 otherwise
+    Outputs:
+        df_rolling (Pandas DF): indexed by (run, date), one column per name in ROLLING_METRICS
+Purpose: To see how the edge of a strategy changes over time (rolling/expanding sharpe, sortino, win rate, max drawdown and expectancy) for one or many backtests
+    Moments come from running sums (window sum = difference of two cumulative sums), so every date costs O(1) whatever the window
+    Max drawdown of a sliding window combines (max, min, drawdown) summaries of power of two blocks (binary lifting), O(log n) per date as whole array numpy steps
+    (about log2(dates) passes over the panel), the expanding case is a single running minimum
+    Same definitions as Metrics: sharpe/sortino are per trade annualised with the trades per year of the full backtest, expectancy is avg win*winrate + avg loss*(1 - winrate) on the window,
+    max drawdown is taken on the equity curve of the full backtest inside the window
+"""
+def rolling_metrics(pnl_panel, dates, initial_capital, window=None, annual_risk_free_rate=0, target_return=0, min_trades=None, run_ids=None):
+    if initial_capital == 0:
+        logger.error("Initial capital cannot be 0")
+        raise ValueError("Initial capital cannot be 0")
+    if run_ids is None and isinstance(pnl_panel, pd.DataFrame):
+        run_ids = pnl_panel.index
+    pnl = np.ascontiguousarray(np.atleast_2d(np.asarray(pnl_panel, dtype=np.float64)))
+    runs, n = pnl.shape
+    if n != len(dates):
+        logger.error(f"pnl_panel has {n} columns but {len(dates)} dates were passed")
+        raise ValueError(f"pnl_panel has {n} columns but {len(dates)} dates were passed")
+    times = pd.to_datetime(pd.Series(np.asarray(dates))).values.astype("datetime64[ns]").astype(np.int64)
+    valid = ~np.isnan(pnl)
+    starts = _window_starts(times, window, valid)
+    if min_trades is None:
+        min_trades = window if isinstance(window, (int, np.integer)) else 2
+    returns = np.where(valid, pnl, 0)/initial_capital
+    wins, losses = valid & (pnl > 0), valid & (pnl <= 0)
+    downside = valid & (returns < target_return)
+    ##Window sum of every row at every date, cumulative sum at the end of the window minus the one before its start
+    def window_sum(values):
+        cumulative = np.concatenate([np.zeros((runs, 1)), np.cumsum(values, axis=1)], axis=1)
+        return cumulative[:, 1:] - np.take_along_axis(cumulative, starts, axis=1)
+    trades = window_sum(valid).astype(np.int64)
+    years = ((times.max() - times.min()) // NS_PER_DAY)/365.25 if n else np.nan
+    equity = initial_capital + np.cumsum(np.where(valid, pnl, 0), axis=1)
+    equity[~valid] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean, std = _window_mean_std(window_sum(returns), window_sum(returns**2), trades)
+        downside_std = _window_mean_std(window_sum(np.where(downside, returns, 0)), window_sum(np.where(downside, returns, 0)**2), window_sum(downside))[1]
+        trades_per_year = (valid.sum(axis=1)/years)[:, None]
+        risk_free_per_trade = annual_risk_free_rate/trades_per_year if annual_risk_free_rate != 0 else 0
+        avg_win = window_sum(np.where(wins, pnl, 0))/window_sum(wins)/initial_capital
+        avg_loss = window_sum(np.where(losses, pnl, 0))/window_sum(losses)/initial_capital
+        winrate = window_sum(wins)/trades
+        columns = {"trades": trades, "sharpe_ratio": (mean - risk_free_per_trade)/std*np.sqrt(trades_per_year),
+                   "sortino_ratio": (mean - target_return)/downside_std*np.sqrt(n/years), "winrate_pct": winrate,
+                   "max_drawdown_pct": _rolling_max_drawdown(equity, starts), "expectancy_pct": _expectancy(avg_win, avg_loss, winrate)}
+    short = trades < min_trades
+    for name in ROLLING_METRICS[1:]:
+        columns[name] = np.where(short, np.nan, columns[name])
+    index = pd.MultiIndex.from_arrays([np.repeat(np.arange(runs) if run_ids is None else np.asarray(run_ids), n), np.tile(pd.to_datetime(times), runs)], names=["run", "date"])
+    return pd.DataFrame({name: columns[name].ravel() for name in ROLLING_METRICS}, index=index)
+
+##Private helpers for rolling_metrics
+def _window_starts(times, window, valid):
+    ##Position of the first point of the window ending at every date, for every run (never decreasing along a run)
+    runs, n = valid.shape
+    if window is None:
+        return np.zeros((runs, n), dtype=np.int64)
+    if isinstance(window, (int, np.integer)):
+        if window < 1:
+            logger.error(f"Invalid rolling window: {window}")
+            raise ValueError(f"Rolling window must be at least 1 trade, got {window}")
+        ##The window starts at the window-th last trade (valid point) of the run up to the date, positions of every run's trades are looked up in one flat array
+        counts = np.cumsum(valid, axis=1)
+        trade_positions = np.flatnonzero(valid.ravel())
+        first_trade = np.concatenate([[0], np.cumsum(valid.sum(axis=1))[:-1]])[:, None]
+        k = counts - window
+        flat = trade_positions[np.clip(first_trade + k, 0, max(len(trade_positions) - 1, 0))] if len(trade_positions) else np.zeros((runs, n), dtype=np.int64)
+        return np.where(k >= 0, flat - np.arange(runs)[:, None]*n, 0)
+    return np.broadcast_to(np.searchsorted(times, times - pd.Timedelta(window).value, side="right"), (runs, n))
+
+def _window_mean_std(total, total_squares, count):
+    ##Mean and sample standard deviation from window sums, a tiny negative variance left by rounding is read as 0
+    mean = total/count
+    return mean, np.where(count < 2, np.nan, np.sqrt(np.maximum(total_squares - total*mean, 0)/(count - 1)))
+
+def _expectancy(avg_win, avg_loss, winrate):
+    ##avg win*winrate + avg loss*(1 - winrate), shared by Metrics, batch_metrics and rolling_metrics, a side without any trade (NaN average, weight 0) adds 0
+    with np.errstate(invalid="ignore"):
+        expectancy = np.where(winrate > 0, avg_win*winrate, 0) + np.where(winrate < 1, avg_loss*(1 - winrate), 0)
+    return np.where(np.isnan(winrate), np.nan, expectancy)
+
+def _rolling_max_drawdown(equity, starts):
+    ##Drawdown of a stretch of equity = min over k <= j of equity[j]/equity[k] - 1, a stretch is summarised as (max, min, drawdown) and two stretches A then B
+    ##combine into (max of both, min of both, min(drawdown A, drawdown B, min B/max A - 1)), fmin/fmax so that NaN points are left out
+    combine = lambda a, b: (np.fmax(a[0], b[0]), np.fmin(a[1], b[1]), np.fmin(np.fmin(a[2], b[2]), b[1]/a[0] - 1))
+    runs, n = equity.shape
+    if n and not starts.any():
+        peak = np.fmax.accumulate(equity, axis=1)
+        return np.fmin.accumulate((equity - peak)/peak, axis=1)
+    ##Binary lifting - level p holds the summary of the 2**p points starting at every position (n - 2**p + 1 of them), the window [start, date] is the blocks
+    ##of the set bits of its length taken left to right (smallest first), so every date combines at most log2(window) disjoint blocks, and every level is built
+    ##from the one before it, about 4*log2(longest window) whole panel passes instead of a python step per date
+    lengths = np.arange(n) - starts + 1
+    level = (equity, equity, np.where(np.isnan(equity), np.nan, 0.0))
+    window = (np.full((runs, n), np.nan),)*3
+    position = np.array(starts, dtype=np.int64)
+    longest = int(lengths.max()) if n else 0
+    p = 0
+    while longest >> p:
+        take = ((lengths >> p) & 1).astype(bool)
+        if take.any():
+            block = [np.take_along_axis(x, np.minimum(position, x.shape[1] - 1), axis=1) for x in level]
+            window = tuple(np.where(take, combined, current) for combined, current in zip(combine(window, block), window))
+            position = position + take*(1 << p)
+        half = 1 << p
+        if longest >> (p + 1):
+            level = combine(tuple(x[:, :-half] for x in level), tuple(x[:, half:] for x in level))
+        p += 1
+    return window[2]
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+##Private helpers for the charts
+
+def _new_figure(nrows, figsize):
+    ##A figure with its own Agg canvas and nrows axes sharing the x axis (what plt.subplots gave us, without registering the figure with pyplot)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(nrows, 1, sharex=True)
+    return fig, axes
+
+def _downsample_indices(values, max_points):
+    ##Positions of the points we plot - all of them, or the first/last point and the min and max of every bucket when there are more than max_points
+    n = len(values)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    size = int(np.ceil(n/max(max_points//2, 1)))
+    buckets = np.append(values, np.full(-n % size, np.nan)).reshape(-1, size)
+    buckets = np.where(np.isnan(buckets), np.nanmean(values), buckets) ##Gaps (and the padding) are never picked as an extreme unless the bucket is all gaps
+    offsets = np.arange(len(buckets))*size
+    return np.unique(np.concatenate([[0, n - 1], offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1)]).clip(0, n - 1))
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
 """
 Type/Interpretation:
     Metrics class is a collection of methods to operate on loading the files for running backtests
@@ -43,13 +339,17 @@ class Metrics():
         else:
             self.df_results = df_results
             self.initial_capital = initial_capital
+            self._core_cache = None ##Filled on first use by self._core(), every metric and plot reads from it
     
     """
     TEMPLATE
     -- FIELDS 
         ...self.df_results ....Pandas DF
         ...self.initial_capital ....Float
+        ...self._core_cache ....Dictionary (None until the first metric is asked for)
     -- METHODS
+        CORE
+        ...self._core(self)     ......core (DICTIONARY of 2-D numpy arrays, one row per pnl column)
         RETURNS MEASURE
         ...self.total_return_pct(self)     ......(gross_return_pct, execution_return_pct, net_return_pct) ALL FLOATS
         ...self.cagr_return_pct(self)           ......(gross_cagr_pct, execution_cagr_pct, net_cagr_pct) ALL FLOATS
@@ -60,6 +360,9 @@ class Metrics():
         ....self.sharpe_ratio(self, annual_risk_free_rate (FLOAT))             ......(gross_sharpe_annual, execution_sharpe_annual, net_sharpe_annual) ALL_FLOATS
         ....self.sortino_ratio(self, target_return (FLOAT))         ........(gross_sortino_annual, execution_sortino_annual, net_sortino_annual) ALL FLOATS
         ....self.max_drawdown_duration_days(self)               ......(gross_dd_days, execution_dd_days, net_dd_days) ALL FLOATS
+        ....self.current_drawdown_days(self)               ......(gross_current_dd_days, execution_current_dd_days, net_current_dd_days) ALL INTS
+        ....self.max_recovery_days(self)               ......(gross_recovery_days, execution_recovery_days, net_recovery_days) ALL FLOATS
+        ....self.drawdown_episodes(self, return_type (STRING))               ......df_episodes (PANDAS DF)
         WIN/LOSS MEASURE
         ....self.total_trades(Self)           ......total_traded(INT)
         ....self.winrate_pct(self)            ......(gross_winrate_pct, execution_winrate_pct, net_winrate_pct) ALL FLOATS
@@ -68,14 +371,57 @@ class Metrics():
         ....self.avg_win_pct(self)            ......(gross_avg_win_pct, execution_avg_win_pct, net_avg_win_pct) ALL FLOATS
         ....self.avg_loss_pct(self)           ......(gross_avg_loss_pct, execution_avg_loss_pct, net_avg_loss_pct) ALL FLOATS
         ....self.expectancy.pct(self)         ......(gross_expectancy_pct, execution_expectancy_pct, net_expectancy_pct) ALL FLOATS
+        ROLLING MEASURE
+        ....self.rolling_metrics(self, return_type(STRING), window(INT/STRING), annual_risk_free_rate(FLOAT), target_return(FLOAT), min_trades(INT))         ......df_rolling (PANDAS DF)
         PLOTS
         .....self.generate_equity_curve(self, gross(BOOLEAN), execution(BOOLEAN), net(BOOLEAN), filename(STRING)): ......filename (String) (Will also generate a png file and save in the same folder)
         .....self.generate_dd_curve(self, gross(BOOLEAN), execution(BOOLEAN), net(BOOLEAN), filename(STRING))     ......filename (String) (Will also generate a png file and save in the same folder)
         .....self.combine_equity_dd_curve(self, gross(BOOLEAN), execution(BOOLEAN), net(BOOLEAN), filename(STRING))     ......filename (String) (Will also generate a png file and save in the same folder)
-        ....self.generate_report(self, strategy (STRING), return_type(STRING), logic(STRING), filename(STRING)):        ......filename (String) (Will also generate a png file and save in the same folder)
+        .....self.generate_rolling_curve(self, window(INT/STRING), gross(BOOLEAN), execution(BOOLEAN), net(BOOLEAN), filename(STRING))     ......filename (String) (Will also generate a png file and save in the same folder)
+        ....self.generate_report(self, strategy (STRING), return_type(STRING), logic(STRING), filename(STRING), rolling_window(INT/STRING)):        ......filename (String) (Will also generate a png file and save in the same folder)
+
+
+    """
+
+    #---------------------------------------------------------------CORE-------------------------------------------------------------------------------------------------------------------------------------#
 
+    ##Rows of the core arrays, in the same order as every 3 way tuple returned by the metrics
+    PNL_COLUMNS = ["gross_pnl", "execution_pnl", "net_pnl"]
 
     """
+    Signature:
+        Inputs: self
+        Outputs: core (Dictionary) with the following keys, every array has one row per pnl column (gross, execution, net) and one column per trade:
+            pnl (Numpy float64 2-D array): pnl of every trade, NaN where the pnl is None
+            returns (Numpy float64 2-D array): pnl/initial_capital
+            equity (Numpy float64 2-D array): initial_capital + cumulative pnl, NaN where the pnl is NaN (same as pandas cumsum)
+            peak (Numpy float64 2-D array): running maximum of equity, NaN where the pnl is NaN (same as pandas cummax)
+            drawdown (Numpy float64 2-D array): (equity - peak)/peak, 0 at a new peak, negative in a drawdown
+            in_dd (Numpy bool 2-D array): True where equity is below its peak
+            dd_days (Numpy int64 2-D array): days since the first trade of the drawdown we are in, 0 outside of a drawdown
+            max_duration_days, current_duration_days, max_recovery_days, episodes: the drawdown episodes of the 3 curves, same as drawdown_scan
+            total (Numpy float64 array): sum of the pnl of every row (NaN skipped)
+            trades (Numpy int64 array): number of trades with a pnl in every row
+            times (Numpy int64 array): dates of the trades as nanoseconds since 1970-01-01
+            years (Float): (last date - first date)/365.25
+    Purpose: To compute the equity curve and everything derived from it once, for the 3 pnl columns together, instead of once per metric and per pnl column
+        The result is cached, it is rebuilt only if self.df_results is replaced by another df (the df should not be modified in place once metrics are asked for)
+        Trades are expected in date order (as results_final gives them), peak, drawdown, in_dd, dd_days and the episodes come from drawdown_scan
+    """
+    def _core(self):
+        if self._core_cache is not None and self._core_cache["df_results"] is self.df_results:
+            return self._core_cache
+        pnl = np.ascontiguousarray(self.df_results[self.PNL_COLUMNS].to_numpy(dtype=np.float64).T)
+        missing = np.isnan(pnl)
+        ##Row by row contiguous arrays, so that sums along a row add up in the same order as pandas does for a single column
+        equity = self.initial_capital + np.cumsum(np.where(missing, 0, pnl), axis=1)
+        equity[missing] = np.nan
+        times = pd.to_datetime(self.df_results["date"]).values.astype("datetime64[ns]").astype(np.int64)
+        ##Peak, drawdown and every drawdown episode in one pass over the 3 curves
+        scan = drawdown_scan(equity, times)
+        self._core_cache = {"df_results": self.df_results, "pnl": pnl, "returns": pnl/self.initial_capital, "equity": equity, "total": np.where(missing, 0, pnl).sum(axis=1),
+                            "trades": (~missing).sum(axis=1), "times": times, "years": ((times.max() - times.min()) // NS_PER_DAY)/365.25 if len(times) else np.nan, **scan}
+        return self._core_cache
 
     #---------------------------------------------------------------RETURNS MEASURE-------------------------------------------------------------------------------------------------------------------------------------#
 
@@ -89,9 +435,7 @@ class Metrics():
     Purpose: To generate cumulative return pct (gross, execution, net) for the objct created
     """
     def total_return_pct(self):
-        gross_return_pct = self.df_results["gross_pnl"].sum()/self.initial_capital
-        execution_return_pct = self.df_results["execution_pnl"].sum()/self.initial_capital
-        net_return_pct = self.df_results["net_pnl"].sum()/self.initial_capital
+        gross_return_pct, execution_return_pct, net_return_pct = self._core()["total"]/self.initial_capital
         return gross_return_pct, execution_return_pct, net_return_pct
     
 
@@ -107,14 +451,8 @@ class Metrics():
         Formula for CAGR - (Ending Value / Beginning Value)^(1/Years) - 1 where years = (end date - begin date)/365.25
     """
     def cagr_return_pct(self):
-        time_period = self.df_results.date.max() - self.df_results.date.min()
-        years = time_period.days/365.25
-        gross_final_value = self.initial_capital +  self.df_results["gross_pnl"].sum()
-        execution_final_value = self.initial_capital +  self.df_results["execution_pnl"].sum()
-        net_final_value = self.initial_capital +  self.df_results["net_pnl"].sum()
-        gross_cagr_pct = ((gross_final_value/self.initial_capital)**(1/years)) - 1
-        execution_cagr_pct = ((execution_final_value/self.initial_capital)**(1/years)) - 1 
-        net_cagr_pct = ((net_final_value/self.initial_capital)**(1/years)) - 1 
+        core = self._core()
+        gross_cagr_pct, execution_cagr_pct, net_cagr_pct = [((final_value/self.initial_capital)**(1/core["years"])) - 1 for final_value in self.initial_capital + core["total"]]
         return gross_cagr_pct, execution_cagr_pct, net_cagr_pct
     
 
@@ -212,26 +550,8 @@ class Metrics():
     """
      
     def max_drawdown_pct(self):
-        # Create equity curves, the below variables are series, cumsum gets the cumsum series
-        gross_equity = self.initial_capital + self.df_results["gross_pnl"].cumsum()
-        execution_equity = self.initial_capital + self.df_results["execution_pnl"].cumsum()
-        net_equity = self.initial_capital + self.df_results["net_pnl"].cumsum()
-        
-        # Calculate running maximum (peak), also series the below vairables
-        gross_peak = gross_equity.cummax()
-        execution_peak = execution_equity.cummax()
-        net_peak = net_equity.cummax()
-        
-        # Calculate drawdown at each point, also series, the below vars
-        gross_drawdown = (gross_equity - gross_peak) / gross_peak
-        execution_drawdown = (execution_equity - execution_peak) / execution_peak
-        net_drawdown = (net_equity - net_peak) / net_peak
-        
-        # Maximum drawdown is the minimum (most negative) value
-        gross_max_dd_pct = gross_drawdown.min()
-        execution_max_dd_pct = execution_drawdown.min()
-        net_max_dd_pct = net_drawdown.min()
-        
+        # Equity, peak and drawdown at each point come from the core, maximum drawdown is the minimum (most negative) value
+        gross_max_dd_pct, execution_max_dd_pct, net_max_dd_pct = np.fmin.reduce(self._core()["drawdown"], axis=1, initial=np.nan)
         return gross_max_dd_pct, execution_max_dd_pct, net_max_dd_pct
     
 
@@ -247,9 +567,10 @@ class Metrics():
         We will abs for max DD as max DD will return negative values for us
     """
     def calmar_ratio(self):
-        gross_calmar = self.cagr_return_pct()[0]/abs(self.max_drawdown_pct()[0])
-        execution_calmar = self.cagr_return_pct()[1]/abs(self.max_drawdown_pct()[1])
-        net_calmar = self.cagr_return_pct()[2]/abs(self.max_drawdown_pct()[2])
+        cagr, max_dd = self.cagr_return_pct(), self.max_drawdown_pct()
+        gross_calmar = cagr[0]/abs(max_dd[0])
+        execution_calmar = cagr[1]/abs(max_dd[1])
+        net_calmar = cagr[2]/abs(max_dd[2])
         return gross_calmar, execution_calmar, net_calmar
     
 
@@ -268,22 +589,17 @@ class Metrics():
 
     def sharpe_ratio(self, annual_risk_free_rate = 0):
       # Calculate time period and trades per year
-        time_period_years = (self.df_results.date.max() - self.df_results.date.min()).days / 365.25
-        total_trades = self.total_trades()
-        trades_per_year = total_trades / time_period_years
+        core = self._core()
+        trades_per_year = self.total_trades() / core["years"]
         
         # Convert annual risk-free rate to per-trade rate
         risk_free_per_trade = annual_risk_free_rate / trades_per_year if annual_risk_free_rate != 0 else 0
         
-        # Calculate returns per trade
-        gross_returns = self.df_results["gross_pnl"] / self.initial_capital
-        execution_returns = self.df_results["execution_pnl"] / self.initial_capital
-        net_returns = self.df_results["net_pnl"] / self.initial_capital
-        
-        # Calculate Sharpe (per trade, with excess return)
-        gross_sharpe = (gross_returns.mean() - risk_free_per_trade) / gross_returns.std()
-        execution_sharpe = (execution_returns.mean() - risk_free_per_trade) / execution_returns.std()
-        net_sharpe = (net_returns.mean() - risk_free_per_trade) / net_returns.std()
+        # Calculate Sharpe (per trade, with excess return), returns per trade come from the core
+        gross_mean_std, execution_mean_std, net_mean_std = [self._mean_std(returns) for returns in core["returns"]]
+        gross_sharpe = (gross_mean_std[0] - risk_free_per_trade) / gross_mean_std[1]
+        execution_sharpe = (execution_mean_std[0] - risk_free_per_trade) / execution_mean_std[1]
+        net_sharpe = (net_mean_std[0] - risk_free_per_trade) / net_mean_std[1]
         
         # Annualize by multiplying by sqrt(trades_per_year)
         gross_sharpe_annual = gross_sharpe * np.sqrt(trades_per_year)
@@ -310,28 +626,19 @@ class Metrics():
 
     def sortino_ratio(self, target_return = 0):
         # Calculate time period and trades per year
-        time_period_years = (self.df_results.date.max() - self.df_results.date.min()).days / 365.25
-        total_trades = len(self.df_results)
-        trades_per_year = total_trades / time_period_years
-        
-        # Calculate returns per trade
-        gross_returns = self.df_results["gross_pnl"] / self.initial_capital
-        execution_returns = self.df_results["execution_pnl"] / self.initial_capital
-        net_returns = self.df_results["net_pnl"] / self.initial_capital
+        core = self._core()
+        trades_per_year = len(self.df_results) / core["years"]
         
-        # Calculate downside deviation (only negative returns)
-        gross_downside = gross_returns[gross_returns < target_return]
-        execution_downside = execution_returns[execution_returns < target_return]
-        net_downside = net_returns[net_returns < target_return]
-        
-        gross_downside_std = gross_downside.std()
-        execution_downside_std = execution_downside.std()
-        net_downside_std = net_downside.std()
+        # Calculate downside deviation (only negative returns), returns per trade come from the core
+        gross_returns, execution_returns, net_returns = core["returns"]
+        gross_downside_std = self._mean_std(gross_returns[gross_returns < target_return])[1]
+        execution_downside_std = self._mean_std(execution_returns[execution_returns < target_return])[1]
+        net_downside_std = self._mean_std(net_returns[net_returns < target_return])[1]
         
         # Calculate Sortino (per trade)
-        gross_sortino = (gross_returns.mean() - target_return) / gross_downside_std
-        execution_sortino = (execution_returns.mean() - target_return) / execution_downside_std
-        net_sortino = (net_returns.mean() - target_return) / net_downside_std
+        gross_sortino = (self._mean_std(gross_returns)[0] - target_return) / gross_downside_std
+        execution_sortino = (self._mean_std(execution_returns)[0] - target_return) / execution_downside_std
+        net_sortino = (self._mean_std(net_returns)[0] - target_return) / net_downside_std
         
         # Annualize
         gross_sortino_annual = gross_sortino * np.sqrt(trades_per_year)
@@ -350,46 +657,59 @@ class Metrics():
             net_dd_days (Float) : commensurate to net_pnl
     Purpose:
         To compute 3 way max days in DD (for gross, execution, net)
-        We will use a helper function here which will compute the dd_duration for a series, and then use it to operate on different pnls
+        A drawdown lasts from its first trade below the peak to its last one (last date - first date), the episodes come from the core (drawdown_scan)
     """
     def max_drawdown_duration_days(self):
-
-        ##Defining a helper function     
-        def calc_max_dd_duration(equity_series, dates):
-            # Calculate peak
-            peak = equity_series.cummax()
-            # Create drawdown indicator
-            in_dd = (equity_series < peak).astype(int)
-            # Create groups for consecutive drawdowns
-            dd_groups = (in_dd != in_dd.shift()).cumsum()
-            # Filter only drawdown periods
-            dd_periods = pd.DataFrame({
-                'date': dates,
-                'in_dd': in_dd,
-                'group': dd_groups
-            })
-            dd_periods = dd_periods[dd_periods['in_dd'] == 1]
-            if len(dd_periods) == 0:
-                return 0
-            # Calculate duration for each group
-            durations = dd_periods.groupby('group')['date'].agg(
-                lambda x: (x.max() - x.min()).days
-            )
-            return durations.max() if len(durations) > 0 else 0
-        
-        # Calculate equity curves
-        gross_equity = self.initial_capital + self.df_results["gross_pnl"].cumsum()
-        execution_equity = self.initial_capital + self.df_results["execution_pnl"].cumsum()
-        net_equity = self.initial_capital + self.df_results["net_pnl"].cumsum()
-        
-        dates = self.df_results['date']
-        
-        gross_dd_days = calc_max_dd_duration(gross_equity, dates)
-        execution_dd_days = calc_max_dd_duration(execution_equity, dates)
-        net_dd_days = calc_max_dd_duration(net_equity, dates)
-        
+        gross_dd_days, execution_dd_days, net_dd_days = self._core()["max_duration_days"]
         return gross_dd_days, execution_dd_days, net_dd_days
 
+    """
+    Signature:
+        Inputs:
+            Self
+        Outputs: Will be a 3 way tuple as below:
+            gross_current_dd_days (Int): commensurate to the gross PnL
+            execution_current_dd_days (Int): commensurate to execution_pnl
+            net_current_dd_days (Int) : commensurate to net_pnl
+    Purpose:
+        To compute 3 way days in the drawdown the backtest ends in (0 if the last trade is at a peak), same definition as max_drawdown_duration_days
+    """
+    def current_drawdown_days(self):
+        gross_current_dd_days, execution_current_dd_days, net_current_dd_days = self._core()["current_duration_days"]
+        return gross_current_dd_days, execution_current_dd_days, net_current_dd_days
+
+    """
+    Signature:
+        Inputs:
+            Self
+        Outputs: Will be a 3 way tuple as below:
+            gross_recovery_days (Float): commensurate to the gross PnL
+            execution_recovery_days (Float): commensurate to execution_pnl
+            net_recovery_days (Float) : commensurate to net_pnl
+    Purpose:
+        To compute 3 way longest time to recovery, days from the trough of a drawdown to the first trade back at the peak, NaN if no drawdown has recovered
+    """
+    def max_recovery_days(self):
+        gross_recovery_days, execution_recovery_days, net_recovery_days = self._core()["max_recovery_days"]
+        return gross_recovery_days, execution_recovery_days, net_recovery_days
+
+    """
+    Signature:
+        Inputs:
+            Self
+            return_type (String): Should be one of "gross", "execution", "net"
+        Outputs:
+            df_episodes (Pandas DF): one row per drawdown of that pnl, with columns peak, start, trough, end, recovery, depth_pct, duration_days, recovery_days, points (see drawdown_scan)
+    Purpose:
+        To list every drawdown of the backtest, for e.g. to see how often and how deep we go under water and how long we take to come back
+    """
+    def drawdown_episodes(self, return_type="execution"):
+        if return_type not in ["gross", "execution", "net"]:
+            logger.error(f"Invalid return_type: {return_type}")
+            raise ValueError("return_type must be 'gross', 'execution', or 'net'")
+        episodes = self._core()["episodes"]
+        return episodes[episodes["row"] == ["gross", "execution", "net"].index(return_type)].drop(columns="row").reset_index(drop=True)
+
     #----------------------------------------------------------------------WIN/LOSS MEASURE-----------------------------------------------------------------------------------------------------------------------------#
     """
     Signature:
@@ -398,7 +718,7 @@ class Metrics():
     Purpose - To get the total trades taken in the strat, where pnl is not none
     """
     def total_trades(self):
-        return self.df_results.gross_pnl.count()
+        return self._core()["trades"][0]
     
 
     """
@@ -412,9 +732,7 @@ class Metrics():
         We will skip any day where PnL is None
     """
     def winrate_pct(self):
-        gross_winrate_pct = len(self.df_results[self.df_results["gross_pnl"] > 0])/self.total_trades()  # ✅ Add len()
-        execution_winrate_pct = len(self.df_results[self.df_results["execution_pnl"] > 0])/self.total_trades()  # ✅ Add len()
-        net_winrate_pct = len(self.df_results[self.df_results["net_pnl"] > 0])/self.total_trades()  # ✅ Add len()
+        gross_winrate_pct, execution_winrate_pct, net_winrate_pct = (self._core()["pnl"] > 0).sum(axis=1)/self.total_trades()
         return gross_winrate_pct, execution_winrate_pct, net_winrate_pct
 
     """
@@ -428,9 +746,7 @@ class Metrics():
         We will skip any day where PnL is None
     """
     def largest_win_pct(self):
-        gross_largest_win_pct = self.df_results.gross_pnl.max()/self.initial_capital
-        execution_largest_win_pct = self.df_results.execution_pnl.max()/self.initial_capital
-        net_largest_win_pct = self.df_results.net_pnl.max() /self.initial_capital
+        gross_largest_win_pct, execution_largest_win_pct, net_largest_win_pct = np.fmax.reduce(self._core()["pnl"], axis=1, initial=np.nan)/self.initial_capital
         return gross_largest_win_pct, execution_largest_win_pct, net_largest_win_pct
     
 
@@ -445,9 +761,7 @@ class Metrics():
         We will skip any day where PnL is None
     """
     def largest_loss_pct(self):
-        gross_largest_loss_pct = self.df_results.gross_pnl.min()/self.initial_capital
-        execution_largest_loss_pct = self.df_results.execution_pnl.min()/self.initial_capital
-        net_largest_loss_pct = self.df_results.net_pnl.min()/self.initial_capital
+        gross_largest_loss_pct, execution_largest_loss_pct, net_largest_loss_pct = np.fmin.reduce(self._core()["pnl"], axis=1, initial=np.nan)/self.initial_capital
         return gross_largest_loss_pct, execution_largest_loss_pct, net_largest_loss_pct
     
     """
@@ -462,10 +776,7 @@ class Metrics():
         Avg_win_pct is defined as (total win pnl/total winning trades)/initial capital
     """
     def avg_win_pct(self):
-        # Use .mean() directly - it's cleaner
-        gross_avg_win = self.df_results[self.df_results["gross_pnl"] > 0]["gross_pnl"].mean()
-        execution_avg_win = self.df_results[self.df_results["execution_pnl"] > 0]["execution_pnl"].mean()
-        net_avg_win = self.df_results[self.df_results["net_pnl"] > 0]["net_pnl"].mean()
+        gross_avg_win, execution_avg_win, net_avg_win = [self._mean_std(pnl[pnl > 0])[0] for pnl in self._core()["pnl"]]
         
         # Convert to percentage of capital
         gross_avg_win_pct = gross_avg_win / self.initial_capital
@@ -486,10 +797,7 @@ class Metrics():
         Avg_loss_pct is defined as (total loss pnl/total losing trades )/initial capital
     """
     def avg_loss_pct(self):
-        # Use .mean() directly - it's cleaner
-        gross_avg_loss = self.df_results[self.df_results["gross_pnl"] <= 0]["gross_pnl"].mean()
-        execution_avg_loss = self.df_results[self.df_results["execution_pnl"] <= 0]["execution_pnl"].mean()
-        net_avg_loss = self.df_results[self.df_results["net_pnl"] <= 0]["net_pnl"].mean()
+        gross_avg_loss, execution_avg_loss, net_avg_loss = [self._mean_std(pnl[pnl <= 0])[0] for pnl in self._core()["pnl"]]
         
         # Convert to percentage of capital
         gross_avg_loss_pct = gross_avg_loss / self.initial_capital
@@ -506,17 +814,38 @@ class Metrics():
             execution_expectancy (float) : commensurate to execution_pnl 
             net_expectancy (float) :commensurate to net_pnl 
     Purpose: to generate expected value or expectancy for a single day for 3 different pnl wehave
-        expectancy is defined as (avg win_pct)*winrate + (avg loss_pct)*lossrate
+        expectancy is defined as (avg win_pct)*winrate + (avg loss_pct)*(1 - winrate), a side without trades adds 0
     """
     def expectancy_pct(self):
-        gross_expectancy_pct = self.avg_win_pct()[0]* self.avg_win_pct()[0] + self.avg_loss_pct()[0]* self.avg_loss_pct()[0]
-        execution_expectancy_pct = self.avg_win_pct()[1]* self.avg_win_pct()[1] + self.avg_loss_pct()[1]* self.avg_loss_pct()[1]
-        net_expectancy_pct = self.avg_win_pct()[1]* self.avg_win_pct()[1] + self.avg_loss_pct()[1]* self.avg_loss_pct()[1]
+        avg_win, avg_loss, winrate = self.avg_win_pct(), self.avg_loss_pct(), self.winrate_pct()
+        gross_expectancy_pct, execution_expectancy_pct, net_expectancy_pct = [float(_expectancy(avg_win[i], avg_loss[i], winrate[i])) for i in range(3)]
         return gross_expectancy_pct, execution_expectancy_pct, net_expectancy_pct
     
         
 
     
+    #----------------------------------------------------------------------ROLLING MEASURE-----------------------------------------------------------------------------------------------------------------------------#
+    """
+    Signature:
+        Inputs:
+            self
+            return_type (String): Should be one of "gross", "execution", "net"
+            window (Int/String): Optional argument - last window trades (such as 60), a calendar window (such as "90D"), or None (default) for expanding
+            annual_risk_free_rate, target_return (Float): Optional arguments - same as sharpe_ratio and sortino_ratio
+            min_trades (Int): Optional argument - same as the module level rolling_metrics
+        Outputs:
+            df_rolling (Pandas DF): indexed by date, columns trades, sharpe_ratio, sortino_ratio, winrate_pct, max_drawdown_pct, expectancy_pct
+    Purpose: To see how the edge decays (or not) through the backtest, every value is the statistic over the window ending at that date
+        Built on the module level rolling_metrics (running sums, and binary lifting for the windowed max drawdown), with the pnl of the core
+    """
+    def rolling_metrics(self, return_type="execution", window=None, annual_risk_free_rate=0, target_return=0, min_trades=None):
+        if return_type not in ["gross", "execution", "net"]:
+            logger.error(f"Invalid return_type: {return_type}")
+            raise ValueError("return_type must be 'gross', 'execution', or 'net'")
+        core = self._core()
+        pnl = core["pnl"][["gross", "execution", "net"].index(return_type)]
+        return rolling_metrics(pnl, core["times"], self.initial_capital, window, annual_risk_free_rate, target_return, min_trades).droplevel("run")
+
     #----------------------------------------------------------------------PLOTS-----------------------------------------------------------------------------------------------------------------------------#
     """
     Signature:
@@ -528,6 +857,8 @@ class Metrics():
             file_path (String) - should be the path (relative or absolute) at which the png file should be stored (this will be clubbed with filename)
                 file_path will be defaulted to None (and will be updated to current directory), and will be clubbed with filename using os.path.join(file_path, filename) for OS  independent ops
             filename (Stirng) - optional argument with default valye as equity_curve.png , will be useful for code reusability
+            dpi (Int) - optional argument, resolution of the png, 300 by default
+            max_points (Int) - optional argument, if given longer series are downsampled to about that many points (the min and max of every bucket are kept, so the drawdowns stay visible)
         Outputs:
             Plot of equity curve vs time (PNG) - saved directly in the same folder in which we are using the function
                 Each of the curves (gross, execution, net) to be mapped on same curve with different colors and use of legends
@@ -536,41 +867,41 @@ class Metrics():
     Purpose:
         Generate the equity curve based on initial capital and returns form start date till end date, and save as PnG in the same folder, also returns the filename which was created
     """
-    def generate_equity_curve(self, gross=False, execution=False, net=False, file_path = None, filename="equity_curve.png"):
+    def generate_equity_curve(self, gross=False, execution=False, net=False, file_path = None, filename="equity_curve.png", dpi=300, max_points=None):
         """
         Generate equity curve plot with CAGR in legend
         """
-        plt.figure(figsize=(14, 7))
+        fig, ax = _new_figure(1, (14, 7))
         
-        # Get CAGR values
+        # Get CAGR values, the curves come from the core
+        core = self._core()
         gross_cagr, execution_cagr, net_cagr = self.cagr_return_pct()
         
         if gross:
-            gross_equity = self.initial_capital + self.df_results["gross_pnl"].cumsum()
-            plt.plot(self.df_results['date'], gross_equity, label=f'Gross (CAGR: {gross_cagr:.2%})', 
+            gross_equity = core["equity"][0]
+            ax.plot(*self._chart_series(gross_equity, max_points), label=f'Gross (CAGR: {gross_cagr:.2%})', 
                     linewidth=2, color='blue')
         
         if execution:
-            execution_equity = self.initial_capital + self.df_results["execution_pnl"].cumsum()
-            plt.plot(self.df_results['date'], execution_equity, label=f'Execution (CAGR: {execution_cagr:.2%})', 
+            execution_equity = core["equity"][1]
+            ax.plot(*self._chart_series(execution_equity, max_points), label=f'Execution (CAGR: {execution_cagr:.2%})', 
                     linewidth=2, color='green')
         
         if net:
-            net_equity = self.initial_capital + self.df_results["net_pnl"].cumsum()
-            plt.plot(self.df_results['date'], net_equity, label=f'Net (CAGR: {net_cagr:.2%})', 
+            net_equity = core["equity"][2]
+            ax.plot(*self._chart_series(net_equity, max_points), label=f'Net (CAGR: {net_cagr:.2%})', 
                     linewidth=2, color='orange')
         
-        plt.title('Equity Curve', fontsize=16, fontweight='bold')
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Portfolio Value', fontsize=12)
-        plt.legend(fontsize=11, loc='best')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
+        ax.set_title('Equity Curve', fontsize=16, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Portfolio Value', fontsize=12)
+        ax.legend(fontsize=11, loc='best')
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
         if file_path == None:
             file_path = os.getcwd()
         file_path = os.path.join(file_path, filename)
-        plt.savefig(file_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
         logger.info(f"Saved equity curve: {filename}")
         return filename  # ADDED
 
@@ -585,6 +916,8 @@ class Metrics():
             file_path (String) - should be the path (relative or absolute) at which the png file should be stored (this will be clubbed with filename)
                 file_path will be defaulted to None (and will be updated to current directory), and will be clubbed with filename using os.path.join(file_path, filename) for OS  independent ops
             filename (Stirng) - optional argument with default valye as drawdown_curve.png , will be useful for code reusability
+            dpi (Int) - optional argument, resolution of the png, 300 by default
+            max_points (Int) - optional argument, if given longer series are downsampled to about that many points (the min and max of every bucket are kept, so the drawdowns stay visible)
         Outputs:
             Plot of DD curve vs time (PNG) - saved directly in the same folder in which we are using the function
                 Each of the curves (gross, execution, net) to be mapped on same curve with different colors and use of legends
@@ -593,48 +926,42 @@ class Metrics():
     Purpose:
         Generate the DD curve based on initial capital and DD from start date till end date, and save as PnG in the same folder, also returns the file name which was generated
     """
-    def generate_dd_curve(self, gross=False, execution=False, net=False, file_path = None, filename="drawdown_curve.png"):
+    def generate_dd_curve(self, gross=False, execution=False, net=False, file_path = None, filename="drawdown_curve.png", dpi=300, max_points=None):
         """
         Generate drawdown curve plot with max DD in legend
         """
-        plt.figure(figsize=(14, 7))
+        fig, ax = _new_figure(1, (14, 7))
         
-        # Get max DD values
+        # Get max DD values, the curves come from the core
+        core = self._core()
         gross_max_dd, execution_max_dd, net_max_dd = self.max_drawdown_pct()
         
         if gross:
-            gross_equity = self.initial_capital + self.df_results["gross_pnl"].cumsum()
-            gross_peak = gross_equity.cummax()
-            gross_dd = (gross_equity - gross_peak) / gross_peak * 100
-            plt.plot(self.df_results['date'], gross_dd, label=f'Gross (Max DD: {gross_max_dd:.2%})', 
+            gross_dd = core["drawdown"][0] * 100
+            ax.plot(*self._chart_series(gross_dd, max_points), label=f'Gross (Max DD: {gross_max_dd:.2%})', 
                     linewidth=2, color='blue')
         
         if execution:
-            execution_equity = self.initial_capital + self.df_results["execution_pnl"].cumsum()
-            execution_peak = execution_equity.cummax()
-            execution_dd = (execution_equity - execution_peak) / execution_peak * 100
-            plt.plot(self.df_results['date'], execution_dd, label=f'Execution (Max DD: {execution_max_dd:.2%})', 
+            execution_dd = core["drawdown"][1] * 100
+            ax.plot(*self._chart_series(execution_dd, max_points), label=f'Execution (Max DD: {execution_max_dd:.2%})', 
                     linewidth=2, color='green')
         
         if net:
-            net_equity = self.initial_capital + self.df_results["net_pnl"].cumsum()
-            net_peak = net_equity.cummax()
-            net_dd = (net_equity - net_peak) / net_peak * 100
-            plt.plot(self.df_results['date'], net_dd, label=f'Net (Max DD: {net_max_dd:.2%})', 
+            net_dd = core["drawdown"][2] * 100
+            ax.plot(*self._chart_series(net_dd, max_points), label=f'Net (Max DD: {net_max_dd:.2%})', 
                     linewidth=2, color='orange')
         
-        plt.axhline(y=0, color='black', linestyle='-', linewidth=0.8)
-        plt.title('Drawdown Curve', fontsize=16, fontweight='bold')
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Drawdown (%)', fontsize=12)
-        plt.legend(fontsize=11, loc='best')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
+        ax.axhline(y=0, color='black', linestyle='-', linewidth=0.8)
+        ax.set_title('Drawdown Curve', fontsize=16, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Drawdown (%)', fontsize=12)
+        ax.legend(fontsize=11, loc='best')
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
         if file_path == None:
             file_path = os.getcwd()
         file_path = os.path.join(file_path, filename)
-        plt.savefig(file_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
         logger.info(f"Saved drawdown curve: {filename}")
         return filename  # ADDED
 
@@ -649,6 +976,8 @@ class Metrics():
             file_path (String) - should be the path (relative or absolute) at which the png file should be stored (this will be clubbed with filename)
                 file_path will be defaulted to None (and will be updated to current directory), and will be clubbed with filename using os.path.join(file_path, filename) for OS  independent ops
             filename (Stirng) - optional argument with default valye as equity_dd_combined.png , will be useful for code reusability
+            dpi (Int) - optional argument, resolution of the png, 300 by default
+            max_points (Int) - optional argument, if given longer series are downsampled to about that many points (the min and max of every bucket are kept, so the drawdowns stay visible)
         Outputs:
             Plot of DD + Equity curve vs time (PNG) - saved directly in the same folder in which we are using the function
                 This will just run both the equity curve function and dd curve function together , and will generate a single png file
@@ -658,48 +987,46 @@ class Metrics():
         Generate the DD curve based on initial capital and DD from start date till end date, and save as PnG in the same folder, also returns the file name of the png file which was generated
 
     """
-    def combine_equity_dd_curve(self, gross=False, execution=False, net=False, file_path = None, filename="equity_dd_combined.png"):
+    def combine_equity_dd_curve(self, gross=False, execution=False, net=False, file_path = None, filename="equity_dd_combined.png", dpi=300, max_points=None):
         """
         Generate combined equity + drawdown plot (2 panels aligned)
         """
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10), sharex=True)
+        fig, (ax1, ax2) = _new_figure(2, (14, 10))
         
-        # Get metrics
+        # Get metrics, the curves come from the core
+        core = self._core()
         gross_cagr, execution_cagr, net_cagr = self.cagr_return_pct()
         gross_max_dd, execution_max_dd, net_max_dd = self.max_drawdown_pct()
         
         # Top panel - Equity Curve
         if gross:
-            gross_equity = self.initial_capital + self.df_results["gross_pnl"].cumsum()
-            ax1.plot(self.df_results['date'], gross_equity, label=f'Gross (CAGR: {gross_cagr:.2%})', 
+            gross_equity = core["equity"][0]
+            ax1.plot(*self._chart_series(gross_equity, max_points), label=f'Gross (CAGR: {gross_cagr:.2%})', 
                     linewidth=2, color='blue')
             
             # Bottom panel - DD for gross
-            gross_peak = gross_equity.cummax()
-            gross_dd = (gross_equity - gross_peak) / gross_peak * 100
-            ax2.plot(self.df_results['date'], gross_dd, label=f'Gross (Max DD: {gross_max_dd:.2%})', 
+            gross_dd = core["drawdown"][0] * 100
+            ax2.plot(*self._chart_series(gross_dd, max_points), label=f'Gross (Max DD: {gross_max_dd:.2%})', 
                     linewidth=2, color='blue')
         
         if execution:
-            execution_equity = self.initial_capital + self.df_results["execution_pnl"].cumsum()
-            ax1.plot(self.df_results['date'], execution_equity, label=f'Execution (CAGR: {execution_cagr:.2%})', 
+            execution_equity = core["equity"][1]
+            ax1.plot(*self._chart_series(execution_equity, max_points), label=f'Execution (CAGR: {execution_cagr:.2%})', 
                     linewidth=2, color='green')
             
             # Bottom panel - DD for execution
-            execution_peak = execution_equity.cummax()
-            execution_dd = (execution_equity - execution_peak) / execution_peak * 100
-            ax2.plot(self.df_results['date'], execution_dd, label=f'Execution (Max DD: {execution_max_dd:.2%})', 
+            execution_dd = core["drawdown"][1] * 100
+            ax2.plot(*self._chart_series(execution_dd, max_points), label=f'Execution (Max DD: {execution_max_dd:.2%})', 
                     linewidth=2, color='green')
         
         if net:
-            net_equity = self.initial_capital + self.df_results["net_pnl"].cumsum()
-            ax1.plot(self.df_results['date'], net_equity, label=f'Net (CAGR: {net_cagr:.2%})', 
+            net_equity = core["equity"][2]
+            ax1.plot(*self._chart_series(net_equity, max_points), label=f'Net (CAGR: {net_cagr:.2%})', 
                     linewidth=2, color='orange')
             
             # Bottom panel - DD for net
-            net_peak = net_equity.cummax()
-            net_dd = (net_equity - net_peak) / net_peak * 100
-            ax2.plot(self.df_results['date'], net_dd, label=f'Net (Max DD: {net_max_dd:.2%})', 
+            net_dd = core["drawdown"][2] * 100
+            ax2.plot(*self._chart_series(net_dd, max_points), label=f'Net (Max DD: {net_max_dd:.2%})', 
                     linewidth=2, color='orange')
         
         # Format top panel (Equity) - ADD X-AXIS
@@ -718,15 +1045,56 @@ class Metrics():
         ax2.legend(fontsize=11, loc='best')
         ax2.grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.tight_layout()
         if file_path == None:
             file_path = os.getcwd()
         file_path = os.path.join(file_path, filename)
-        plt.savefig(file_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
         logger.info(f"Saved combined chart: {filename}")
         return filename
 
+    """
+    Signature:
+        Inputs:
+            self
+            window (Int/String) - window of the rolling metrics, same as rolling_metrics (None for expanding)
+            gross, execution, net (Boolean) - which pnl we want to map (default to be false)
+            file_path (String) - same as generate_equity_curve
+            filename (Stirng) - optional argument with default valye as rolling_metrics.png
+            dpi, max_points (Int) - same as generate_equity_curve
+        Outputs:
+            Plot of rolling sharpe, rolling win rate and rolling max DD vs time (PNG), one panel each, aligned on the same dates
+            filename - returns the filename of the file which was generated (png in this case)
+    Purpose:
+        Generate the rolling metrics chart, to see how the edge of the strategy changes over time
+    """
+    def generate_rolling_curve(self, window, gross=False, execution=False, net=False, file_path = None, filename="rolling_metrics.png", dpi=300, max_points=None):
+        fig, (ax1, ax2, ax3) = _new_figure(3, (14, 10))
+        window_label = "expanding" if window is None else f"{window} trades" if isinstance(window, (int, np.integer)) else window
+        
+        for selected, return_type, label, color in [(gross, "gross", "Gross", "blue"), (execution, "execution", "Execution", "green"), (net, "net", "Net", "orange")]:
+            if selected:
+                df_rolling = self.rolling_metrics(return_type, window)
+                ax1.plot(*self._chart_series(df_rolling["sharpe_ratio"].values, max_points), label=label, linewidth=1.5, color=color)
+                ax2.plot(*self._chart_series(df_rolling["winrate_pct"].values * 100, max_points), label=label, linewidth=1.5, color=color)
+                ax3.plot(*self._chart_series(df_rolling["max_drawdown_pct"].values * 100, max_points), label=label, linewidth=1.5, color=color)
+        
+        for ax, title, ylabel in [(ax1, "Rolling Sharpe", "Sharpe"), (ax2, "Rolling Win Rate", "Win Rate (%)"), (ax3, "Rolling Max Drawdown", "Max DD (%)")]:
+            ax.set_title(f"{title} ({window_label})", fontsize=14, fontweight='bold')
+            ax.set_ylabel(ylabel, fontsize=12)
+            ax.legend(fontsize=10, loc='best')
+            ax.grid(True, alpha=0.3)
+        ax1.axhline(y=0, color='black', linestyle='-', linewidth=0.8)
+        ax3.set_xlabel('Date', fontsize=12)
+        
+        fig.tight_layout()
+        if file_path == None:
+            file_path = os.getcwd()
+        file_path = os.path.join(file_path, filename)
+        fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
+        logger.info(f"Saved rolling metrics chart: {filename}")
+        return filename
+
     #----------------------------------------------------------------------REPORT-----------------------------------------------------------------------------------------------------------------------------#
     """
     Signature:
@@ -738,20 +1106,38 @@ class Metrics():
             file_path (String) - should be the path (relative or absolute) at which the png file should be stored (this will be clubbed with filename)
                 file_path will be defaulted to None (and will be updated to current directory), and will be clubbed with filename using os.path.join(file_path, filename) for OS  independent ops
             filename (String) : Name of the pdf file which needs to be generated
+            rolling_window (Int/String) : Optional argument - if given, a rolling metrics chart (generate_rolling_curve) over that window is added below the monthly returns
+            chart_format (String) : Optional argument - "png" (default) renders the charts with matplotlib (Agg) and embeds them as images,
+                "vector" draws them straight into the pdf as reportlab vector graphics (no raster, no matplotlib, much faster)
+            chart_dpi (Int) : Optional argument - resolution of the png charts, 300 by default, a lower value (such as 100) renders faster at a lower print quality
+            max_points (Int) : Optional argument - None (default) draws every point, if given curves longer than that are downsampled (min and max of every bucket kept) before they are drawn
         Outputs:
             A pdf named <filename>.pdf which will have the following details
                 equity_dd_combined.png curve for return_type selected
                 distributed_returns table - as generaeted from the distributed_returns_df function for the return type seleced
                 ALl other risk/return metrics properly categorised and organised (mentioned in this sheet)
+            self.report_timings (Dictionary): seconds spent in every section of the report, such as {"header": 0.01, "chart": 0.4, ..., "total": 0.9} (also logged)
     Purpose: To generate a new pdf file named <filename>.pdf in the same folder as teh code is running and generate a full bt report
         If a file already exits with the name, it will be overwritten
     """
-    def generate_report(self, strategy, return_type="execution", logic="Confidential", file_path=None, filename="report.pdf"):
+    def generate_report(self, strategy, return_type="execution", logic="Confidential", file_path=None, filename="report.pdf", rolling_window=None,
+                        chart_format="png", chart_dpi=300, max_points=None):
+        ##Seconds per section, lap(section) closes the section which just finished
+        self.report_timings = {}
+        start = last = time.perf_counter()
+        def lap(section):
+            nonlocal last
+            now = time.perf_counter()
+            self.report_timings[section] = now - last
+            last = now
 
         # Validate return_type
         if return_type not in ["gross", "execution", "net"]:
             logger.error(f"Invalid return_type: {return_type}")
             raise ValueError("return_type must be 'gross', 'execution', or 'net'")
+        if chart_format not in ["png", "vector"]:
+            logger.error(f"Invalid chart_format: {chart_format}")
+            raise ValueError("chart_format must be 'png' or 'vector'")
         
         # Handle file paths properly
         if file_path is None:
@@ -763,7 +1149,9 @@ class Metrics():
         
         # Create full paths using os.path.join (cross-platform)
         pdf_path = os.path.join(file_path, filename)
-        chart_filename = os.path.join(file_path, f"temp_{return_type}_equity_dd.png")
+        ##Temp charts are named after the report, so that reports rendered in parallel into the same folder do not overwrite each other's charts
+        chart_filename = os.path.join(file_path, f"temp_{Path(filename).stem}_{return_type}_equity_dd.png")
+        rolling_filename = os.path.join(file_path, f"temp_{Path(filename).stem}_{return_type}_rolling.png")
         
         # Ensure directory exists
         os.makedirs(file_path, exist_ok=True)
@@ -819,14 +1207,20 @@ class Metrics():
         ]))
         elements.append(metadata_table)
         elements.append(Spacer(1, 0.1*inch))
+        lap("header")
         
-        # ========== GENERATE CHART (saved to same directory as PDF) ==========
-        if return_type == "gross":
-            self.combine_equity_dd_curve(gross=True, filename=chart_filename)
-        elif return_type == "execution":
-            self.combine_equity_dd_curve(execution=True, filename=chart_filename)
+        # ========== GENERATE CHART (saved to same directory as PDF, or drawn as vector graphics) ==========
+        idx = {"gross": 0, "execution": 1, "net": 2}[return_type]
+        label, line_color = {"gross": ("Gross", "blue"), "execution": ("Execution", "green"), "net": ("Net", "orange")}[return_type]
+        if chart_format == "png":
+            self.combine_equity_dd_curve(**{return_type: True}, filename=chart_filename, dpi=chart_dpi, max_points=max_points)
+            img = Image(chart_filename, width=4.2*inch, height=2.5*inch)
         else:
-            self.combine_equity_dd_curve(net=True, filename=chart_filename)
+            core = self._core()
+            img = self._vector_chart([(f"Equity Curve - {label} (CAGR: {self.cagr_return_pct()[idx]:.2%})", core["equity"][idx], line_color, False),
+                                      (f"Drawdown Curve (%) - {label} (Max DD: {self.max_drawdown_pct()[idx]:.2%})", core["drawdown"][idx] * 100, line_color, True)],
+                                     4.2*inch, 2.5*inch, max_points)
+        lap("chart")
         
         # Get all metrics
         total_return = self.total_return_pct()
@@ -842,9 +1236,7 @@ class Metrics():
         avg_win = self.avg_win_pct()
         avg_loss = self.avg_loss_pct()
         expectancy = self.expectancy_pct()
-        
-        # Select index based on return_type
-        idx = {"gross": 0, "execution": 1, "net": 2}[return_type]
+        lap("metrics")
         
         # Create compact metrics tables
         returns_data = [
@@ -898,8 +1290,6 @@ class Metrics():
         winloss_table.setStyle(metric_style)
         
         # Arrange chart and metrics side by side
-        img = Image(chart_filename, width=4.2*inch, height=2.5*inch)
-        
         # Put metrics in a single container table
         metrics_container = Table([[returns_table], [risk_table], [winloss_table]])
         metrics_container.setStyle(TableStyle([
@@ -917,6 +1307,7 @@ class Metrics():
         ]))
         elements.append(main_layout)
         elements.append(Spacer(1, 0.08*inch))
+        lap("metric_tables")
         
         # ========== MONTHLY RETURNS TABLE ==========
         elements.append(Paragraph("<b>Monthly Returns (%)</b>", heading_style))
@@ -987,13 +1378,114 @@ class Metrics():
         
         monthly_table.setStyle(TableStyle(table_style))
         elements.append(monthly_table)
+        lap("monthly_table")
+        
+        # ========== ROLLING METRICS ==========
+        if rolling_window is not None:
+            elements.append(Paragraph(f"<b>Rolling Metrics ({rolling_window})</b>", heading_style))
+            if chart_format == "png":
+                self.generate_rolling_curve(rolling_window, **{return_type: True}, filename=rolling_filename, dpi=chart_dpi, max_points=max_points)
+                elements.append(Image(rolling_filename, width=6.6*inch, height=4.7*inch))
+            else:
+                df_rolling = self.rolling_metrics(return_type, rolling_window)
+                elements.append(self._vector_chart([(f"Rolling Sharpe - {label}", df_rolling["sharpe_ratio"].values, line_color, True),
+                                                    (f"Rolling Win Rate (%) - {label}", df_rolling["winrate_pct"].values * 100, line_color, False),
+                                                    (f"Rolling Max Drawdown (%) - {label}", df_rolling["max_drawdown_pct"].values * 100, line_color, True)],
+                                                   6.6*inch, 4.7*inch, max_points))
+            lap("rolling_chart")
         
         # Build PDF
         doc.build(elements)
         
-        # Clean up temporary chart file
-        if os.path.exists(chart_filename):
-            os.remove(chart_filename)
+        # Clean up temporary chart files
+        for temp_filename in [chart_filename, rolling_filename]:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+        lap("build")
+        self.report_timings["total"] = time.perf_counter() - start
+        logger.info("Report timings: " + ", ".join(f"{section} {seconds:.2f}s" for section, seconds in self.report_timings.items()))
         
         logger.info(f"Report generated: {pdf_path}")
-        return pdf_path  # Return full path
\ No newline at end of file
+        return pdf_path  # Return full path
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+    ##Private helper - a reportlab Drawing of stacked line charts (vector graphics, nothing is rasterised) for chart_format="vector"
+    ##panels is a list of (title, values aligned with df_results, color name, zero line or not), NaN points are left out
+    def _vector_chart(self, panels, width, height, max_points=None):
+        drawing = Drawing(width, height)
+        panel_height = height/len(panels)
+        days = pd.to_datetime(self.df_results["date"]).values.astype("datetime64[D]").astype(np.int64)
+        for number, (title, values, color, zero_line) in enumerate(panels):
+            bottom = height - (number + 1)*panel_height
+            drawing.add(String(4, bottom + panel_height - 9, title, fontName="Helvetica-Bold", fontSize=7))
+            positions = _downsample_indices(values, max_points)
+            positions = positions[~np.isnan(values[positions])]
+            if len(positions) < 2:
+                drawing.add(String(width/2, bottom + panel_height/2, "Not enough trades", fontSize=7, textAnchor="middle"))
+                continue
+            plot = LinePlot()
+            plot.x, plot.y, plot.width, plot.height = 38, bottom + 14, width - 46, panel_height - 28
+            plot.data = [list(zip(days[positions].tolist(), values[positions].tolist()))]
+            plot.lines[0].strokeColor, plot.lines[0].strokeWidth = getattr(colors, color), 0.8
+            plot.xValueAxis.valueMin, plot.xValueAxis.valueMax = int(days[positions[0]]), int(days[positions[-1]])
+            plot.xValueAxis.labelTextFormat = lambda day: str(np.datetime64(int(day), "D"))[:7]
+            plot.xValueAxis.labels.fontSize = plot.yValueAxis.labels.fontSize = 6
+            plot.yValueAxis.visibleGrid, plot.yValueAxis.gridStrokeColor, plot.yValueAxis.gridStrokeWidth = True, colors.lightgrey, 0.3
+            ##Fixed y range (instead of the axis' own rounding) so that we know where to draw the zero line
+            low, high = float(np.min(values[positions])), float(np.max(values[positions]))
+            low, high = (low - 1, high + 1) if low == high else (low, high)
+            plot.yValueAxis.valueMin, plot.yValueAxis.valueMax = low, high
+            drawing.add(plot)
+            if zero_line and low < 0 < high:
+                zero = plot.y + plot.height*(0 - low)/(high - low)
+                drawing.add(Line(plot.x, zero, plot.x + plot.width, zero, strokeColor=colors.black, strokeWidth=0.5))
+        return drawing
+
+    ##Private helper - dates and values of a curve to plot, downsampled to about max_points (see _downsample_indices)
+    def _chart_series(self, values, max_points=None):
+        positions = _downsample_indices(values, max_points)
+        return self.df_results["date"].values[positions], np.asarray(values)[positions]
+
+    ##Private helper - mean and sample standard deviation of a 1-D array, NaN skipped, done the way pandas does it (NaN filled with 0 in the sums) so the numbers do not change
+    @staticmethod
+    def _mean_std(values):
+        valid = ~np.isnan(values)
+        count = valid.sum()
+        if count == 0:
+            return np.nan, np.nan
+        mean = np.where(valid, values, 0).sum()/count
+        if count < 2:
+            return mean, np.nan
+        return mean, np.sqrt(np.where(valid, (mean - values)**2, 0).sum()/(count - 1))
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        jobs (List of Dictionaries): one per report, each with "df_results" and "initial_capital" (same as Metrics) and the arguments of generate_report,
+            for e.g. [{"df_results": df, "initial_capital": 100000, "strategy": "BTST", "return_type": "gross", "filename": "btst_gross.pdf"}, ...]
+        num_workers (Int): Optional argument - number of worker processes, by default os.cpu_count(), 1 (or less) renders everything in this process
+    Outputs:
+        df_timings (Pandas DF): one row per report (in the order of jobs), with the pdf path and the report_timings of every section
+Purpose: To render many reports (several return types, strategies or sweep candidates) in parallel worker processes
+    Charts are drawn on their own Agg figures (no pyplot state), so the workers do not share anything
+"""
+def generate_reports(jobs, num_workers=None):
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = min(num_workers, len(jobs))
+    start = time.perf_counter()
+    if num_workers <= 1:
+        outcomes = [_generate_report_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            outcomes = list(executor.map(_generate_report_job, jobs))
+    logger.info(f"Generated {len(jobs)} reports in {time.perf_counter() - start:.1f}s with {max(num_workers, 1)} workers")
+    return pd.DataFrame([{"pdf_path": pdf_path, **timings} for pdf_path, timings in outcomes])
+
+##Private helper for generate_reports - runs in the worker, one report
+def _generate_report_job(job):
+    report_args = {key: value for key, value in job.items() if key not in ["df_results", "initial_capital"]}
+    metrics = Metrics(job["df_results"], job["initial_capital"])
+    pdf_path = metrics.generate_report(**report_args)
+    return pdf_path, metrics.report_timings
@@ -6,24 +6,51 @@ import numpy as np
 from functools import reduce ##reduce will help us club multiple filters together
 import operator
 
+##Setting up the logger
+import logging
+logger = logging.getLogger(__name__)
+
 """
 Type/Interpretation - Execution is a collection of methods to model different txns with certain slippage assumptions 
-It will have 1 attributes for itself:
+It will have the following attributes for itself:
 - slippage_pct(float): In % terms, how much slippage we want to assum diring exection, for e.g. 0.02 will represent 2% slippage
+- tick_size(float): minimum price move of the instrument, for e.g. 0.05 for Nifty options (used by the fixed tick model)
+- spread_ticks(float): how many ticks we pay away from the open on every fill (used by the fixed tick model)
+- range_pct(float): fraction of the candle's high-low range we pay away from the open, for e.g. 0.1 (used by the range model)
+- reference_volume(float): volume at which the impact model charges exactly slippage_pct, None means the median volume of the batch
 """
 class Execution():
-    def __init__(self, slippage_pct = 0.01):
+    def __init__(self, slippage_pct = 0.01, tick_size = 0.05, spread_ticks = 1, range_pct = 0.1, reference_volume = None):
             self.slippage_pct = slippage_pct
+            self.tick_size = tick_size
+            self.spread_ticks = spread_ticks
+            self.range_pct = range_pct
+            self.reference_volume = reference_volume
     
     """
     TEMPLATE
     -- FIELDS (NONE)
     .....self.slippage_pct    .....FLOAT
+    .....self.tick_size    .....FLOAT
+    .....self.spread_ticks    .....FLOAT
+    .....self.range_pct    .....FLOAT
+    .....self.reference_volume    .....FLOAT (or None)
 
     -- METHODS:
     .....self.txn_price_simple_avg(self, signal (STRING)): .... (execution_price, execution_cost) BOTH FLOATS
+    .....self.txn_price_simple_avg_batch(self, side, open_price, high_price, low_price, close_price): .... (execution_price, execution_cost) BOTH NUMPY ARRAYS
+    .....self.txn_price_fixed_tick_batch(self, side, open_price): .... (execution_price, execution_cost) BOTH NUMPY ARRAYS
+    .....self.txn_price_range_pct_batch(self, side, open_price, high_price, low_price): .... (execution_price, execution_cost) BOTH NUMPY ARRAYS
+    .....self.txn_price_volume_impact_batch(self, side, open_price, volume): .... (execution_price, execution_cost) BOTH NUMPY ARRAYS
+    .....self.price_batch(self, model, side, open_price, high_price, low_price, close_price, volume): .... (execution_price, execution_cost) BOTH NUMPY ARRAYS
     """
 
+    ##Batched models available through price_batch, and the candle fields each one needs
+    MODELS = {"simple_avg": ("open_price", "high_price", "low_price", "close_price"),
+              "fixed_tick": ("open_price",),
+              "range_pct": ("open_price", "high_price", "low_price"),
+              "volume_impact": ("open_price", "volume")}
+
     #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
 
     """
@@ -57,8 +84,131 @@ class Execution():
                 raise ValueError(f"Invalid signal: '{signal}'. Must be 'BUY' or 'SELL'")  # ADDED
             return execution_price, execution_cost
 
-              
-        
-                
 
-                
\ No newline at end of file
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+    ##BATCHED MODELS
+    ##Every batched model takes numpy arrays (or anything np.asarray accepts) of equal length and a side flag per fill (+1 for BUY, -1 for SELL)
+    ##and returns two float64 arrays, with the same sign convention for the cost as txn_price_simple_avg (negative means we are losing):
+    ##   execution_cost = side * (open_price - execution_price) -> open - price for a buy, price - open for a sell
+    
+    """
+    Signature:
+        Inputs:
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value for the whole batch or one per fill
+            n (Int): number of fills in the batch
+        Outputs:
+            side (Numpy array): float64 array of +1/-1 of length n
+    Purpose: Private helper to turn the side flags into a numeric array we can multiply with
+    """
+    def _side_array(self, side, n):
+        side = np.asarray(side)
+        if side.dtype.kind in "OUS":
+            side = np.where(side == "BUY", 1.0, np.where(side == "SELL", -1.0, np.nan))
+        side = np.broadcast_to(np.asarray(side, dtype=np.float64), (n,))
+        if not np.isin(side, [1.0, -1.0]).all():
+            logger.error("Invalid side in batch, must be +1/-1 or 'BUY'/'SELL'")
+            raise ValueError("Invalid side in batch, must be +1/-1 or 'BUY'/'SELL'")
+        return side
+
+    """
+    Signature:
+        Inputs:
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value or one per fill
+            open_price, high_price, low_price, close_price (Array like): candle of every fill, such as np.array([123.2, 98.1])
+        Outputs:
+            execution_price (Numpy array): simple avg of OHLC * (1 + slippage) for buys and * (1 - slippage) for sells
+            execution_cost (Numpy array): open - execution price for buys, execution price - open for sells
+    Purpose: Batched version of txn_price_simple_avg, gives exactly the same floats for the same inputs
+    """
+    def txn_price_simple_avg_batch(self, side, open_price, high_price, low_price, close_price):
+        open_price = np.asarray(open_price, dtype=np.float64)
+        side = self._side_array(side, len(open_price))
+        execution_price = (open_price + np.asarray(high_price, dtype=np.float64) + np.asarray(low_price, dtype=np.float64) + np.asarray(close_price, dtype=np.float64))/4*(1 + side*self.slippage_pct)
+        execution_cost = side*(open_price - execution_price)
+        return execution_price, execution_cost
+
+    """
+    Signature:
+        Inputs:
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value or one per fill
+            open_price (Array like): open of the candle of every fill
+        Outputs:
+            execution_price (Numpy array): open + spread_ticks*tick_size for buys, open - spread_ticks*tick_size for sells
+            execution_cost (Numpy array): -spread_ticks*tick_size for every fill
+    Purpose: To model a fixed bid-ask spread, we always cross a fixed number of ticks away from the open
+    """
+    def txn_price_fixed_tick_batch(self, side, open_price):
+        open_price = np.asarray(open_price, dtype=np.float64)
+        side = self._side_array(side, len(open_price))
+        execution_price = open_price + side*self.spread_ticks*self.tick_size
+        execution_cost = side*(open_price - execution_price)
+        return execution_price, execution_cost
+
+    """
+    Signature:
+        Inputs:
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value or one per fill
+            open_price, high_price, low_price (Array like): candle of every fill
+        Outputs:
+            execution_price (Numpy array): open + range_pct*(high - low) for buys, open - range_pct*(high - low) for sells
+            execution_cost (Numpy array): -range_pct*(high - low) for every fill
+    Purpose: To model slippage which scales with how volatile the candle was, rather than with the price level
+    """
+    def txn_price_range_pct_batch(self, side, open_price, high_price, low_price):
+        open_price = np.asarray(open_price, dtype=np.float64)
+        side = self._side_array(side, len(open_price))
+        candle_range = np.asarray(high_price, dtype=np.float64) - np.asarray(low_price, dtype=np.float64)
+        execution_price = open_price + side*self.range_pct*candle_range
+        execution_cost = side*(open_price - execution_price)
+        return execution_price, execution_cost
+
+    """
+    Signature:
+        Inputs:
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value or one per fill
+            open_price (Array like): open of the candle of every fill
+            volume (Array like): traded volume of the candle of every fill (the "_volume" column of the options data)
+            reference_volume (Float): Optional argument - defaults to self.reference_volume, and to the median positive volume of the batch if that is None too
+        Outputs:
+            execution_price (Numpy array): open*(1 + slippage*sqrt(reference_volume/volume)) for buys, open*(1 - ...) for sells
+                NaN where the volume is 0 or missing, as we could not have traded that candle
+            execution_cost (Numpy array): same convention as the other models
+    Purpose: Square root impact model, thin candles cost more than slippage_pct and liquid candles less
+    """
+    def txn_price_volume_impact_batch(self, side, open_price, volume, reference_volume = None):
+        open_price = np.asarray(open_price, dtype=np.float64)
+        side = self._side_array(side, len(open_price))
+        volume = np.asarray(volume, dtype=np.float64)
+        traded = volume > 0
+        if reference_volume is None:
+            reference_volume = self.reference_volume
+        if reference_volume is None:
+            reference_volume = np.median(volume[traded]) if traded.any() else np.nan
+        if not traded.all():
+            logger.warning(f"{(~traded).sum()} fills on candles without volume, execution price set to NaN")
+        impact = self.slippage_pct*np.sqrt(reference_volume/np.where(traded, volume, np.nan))
+        execution_price = open_price*(1 + side*impact)
+        execution_cost = side*(open_price - execution_price)
+        return execution_price, execution_cost
+
+    """
+    Signature:
+        Inputs:
+            model (String): one of the keys of Execution.MODELS - "simple_avg", "fixed_tick", "range_pct", "volume_impact"
+            side (Int/String/Array like): +1/"BUY" or -1/"SELL", either a single value or one per fill
+            open_price, high_price, low_price, close_price, volume (Array like): candle of every fill, only the fields the model needs have to be passed
+        Outputs:
+            execution_price, execution_cost (Numpy arrays): as returned by the model
+    Purpose: Single entry point to the batched models, so the caller can switch execution assumptions with a config value
+    """
+    def price_batch(self, model, side, open_price, high_price = None, low_price = None, close_price = None, volume = None):
+        if model not in self.MODELS:
+            logger.error(f"Invalid execution model: '{model}'. Must be one of {list(self.MODELS)}")
+            raise ValueError(f"Invalid execution model: '{model}'. Must be one of {list(self.MODELS)}")
+        fields = {"open_price": open_price, "high_price": high_price, "low_price": low_price, "close_price": close_price, "volume": volume}
+        missing = [field for field in self.MODELS[model] if fields[field] is None]
+        if missing:
+            logger.error(f"Execution model '{model}' needs {missing}")
+            raise ValueError(f"Execution model '{model}' needs {missing}")
+        pricer = getattr(self, f"txn_price_{model}_batch")
+        return pricer(side, *[fields[field] for field in self.MODELS[model]])
@@ -0,0 +1,164 @@
+##Importing the relevant libraries/packages
+import pandas as pd
+import numpy as np
+
+##Setting up the logger
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Type/Interpretation - TradeLedger is an array backed table of trades, which the signal engine appends to while it walks the data
+It replaces building a df row by row (pd.concat per trade, which is quadratic in the number of trades)
+Every column is a preallocated numpy array, which doubles in size when it is full, so appending is amortised O(1)
+It will have the following attributes:
+- capacity (Int): number of rows currently allocated, will grow as needed
+- Typed columns: Date (datetime64[s]), Instrument (object), Buy Price, Buy Execution Cost, Sell Price, Sell Execution Cost (all float64, NaN if not filled)
+"""
+class TradeLedger():
+    COLUMNS = ["Date", "Instrument", "Buy Price", "Buy Execution Cost", "Sell Price", "Sell Execution Cost"]
+
+    def __init__(self, capacity = 1024):
+        self._size = 0
+        self._columns = {}
+        self._allocate(max(int(capacity), 1))
+
+    """
+    TEMPLATE
+    -- FIELDS
+    .....self._size    .....INT (number of trades appended)
+    .....self._columns    .....DICT {column name: numpy array of length capacity}
+
+    -- METHODS:
+    .....self.append(self, date, instrument, buy_price, buy_execution_cost, sell_price, sell_execution_cost): .... row (INT)
+    .....self.extend(self, dates, instruments, buy_prices, buy_execution_costs, sell_prices, sell_execution_costs): .... None
+    .....self.set_exit(self, row, sell_price, sell_execution_cost): .... None
+    .....self.find(self, date): .... row (INT or None)
+    .....self.to_frame(self): .... df_trades (PANDAS DF)
+    .....self.to_arrow(self): .... table (PYARROW TABLE)
+    .....TradeLedger.from_dict_signal(dict_signal): .... TradeLedger
+    """
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+    """
+    Signature:
+        Inputs:
+            date (Python date/String/Datetime): date of the trade, such as datetime.date(2022, 1, 3)
+            instrument (String): instrument traded, such as "NIFTY06JAN2217650CE"
+            buy_price, buy_execution_cost (Float): entry side of the trade
+            sell_price, sell_execution_cost (Float): Optional arguments - exit side, NaN by default (can be set later with set_exit)
+        Outputs:
+            row (Int): position of the trade in the ledger, to be passed to set_exit
+    Purpose: To add a single trade at the end of the ledger
+    """
+    def append(self, date, instrument, buy_price, buy_execution_cost, sell_price = np.nan, sell_execution_cost = np.nan):
+        if self._size == len(self._columns["Date"]):
+            self._allocate(2 * self._size)
+        row = self._size
+        values = [np.datetime64(pd.Timestamp(date).normalize(), "s"), instrument, buy_price, buy_execution_cost, sell_price, sell_execution_cost]
+        for column, value in zip(self.COLUMNS, values):
+            self._columns[column][row] = np.nan if value is None else value
+        self._size += 1
+        return row
+
+    """
+    Signature:
+        Inputs:
+            dates, instruments, buy_prices, buy_execution_costs (Array like): one value per trade, all of the same length
+            sell_prices, sell_execution_costs (Array like): Optional arguments - NaN by default
+        Outputs: None
+    Purpose: To add many trades in one go (for e.g. the output of a vectorised signal engine) without a python loop
+    """
+    def extend(self, dates, instruments, buy_prices, buy_execution_costs, sell_prices = None, sell_execution_costs = None):
+        n = len(dates)
+        if self._size + n > len(self._columns["Date"]):
+            self._allocate(max(2 * len(self._columns["Date"]), self._size + n))
+        values = [pd.to_datetime(pd.Series(dates, dtype=object)).dt.normalize().values.astype("datetime64[s]"), np.asarray(instruments, dtype=object),
+                  buy_prices, buy_execution_costs,
+                  np.nan if sell_prices is None else sell_prices, np.nan if sell_execution_costs is None else sell_execution_costs]
+        for column, value in zip(self.COLUMNS, values):
+            self._columns[column][self._size:self._size + n] = value
+        self._size += n
+
+    """
+    Signature:
+        Inputs:
+            row (Int or Array of Ints): row returned by append (or rows of trades added with extend, to set many exits in one go)
+            sell_price, sell_execution_cost (Float or Array of Floats): exit side of the trade(s) (None is stored as NaN)
+        Outputs: None
+    Purpose: To fill the exit of a trade which was appended when we entered it
+    """
+    def set_exit(self, row, sell_price, sell_execution_cost):
+        rows = np.asarray(row)
+        if rows.size > 0 and (rows.max() >= self._size or rows.min() < 0):
+            logger.error(f"Row {row} not in ledger of {self._size} trades")
+            raise IndexError(f"Row {row} not in ledger of {self._size} trades")
+        self._columns["Sell Price"][rows] = np.nan if sell_price is None else sell_price
+        self._columns["Sell Execution Cost"][rows] = np.nan if sell_execution_cost is None else sell_execution_cost
+
+    """
+    Signature:
+        Inputs:
+            date (Python date/String/Datetime): date of the trade, such as datetime.date(2022, 1, 3)
+        Outputs:
+            row (Int): last row of the ledger with this date, None if there is no trade on that date
+    Purpose: To get back the row of a trade we want to exit, when only its date was carried forward (the dict_signal style of the day walk)
+        The search starts from the end, the trade we exit is one of the last ones appended, so it is a couple of comparisons and not a scan of the ledger
+    """
+    def find(self, date):
+        target = np.datetime64(pd.Timestamp(date).normalize(), "s")
+        dates = self._columns["Date"]
+        for row in range(self._size - 1, -1, -1):
+            if dates[row] == target:
+                return row
+        return None
+
+    def __len__(self):
+        return self._size
+
+    """
+    Signature:
+        Inputs: self
+        Outputs:
+            df_trades (Pandas DF): with columns "Date" (datetime64), "Instrument", "Buy Price", "Buy Execution Cost", "Sell Price", "Sell Execution Cost"
+    Purpose: To convert the ledger to a df, columns are views of the ledger arrays (no copy), so the ledger should not be appended to while the df is in use
+        With copy=False pandas keeps every array of the dict as its own block (no consolidation of the float columns into one 2-D block, which is where a copy would happen)
+    """
+    def to_frame(self):
+        return pd.DataFrame({column: self._columns[column][:self._size] for column in self.COLUMNS}, copy=False)
+
+    """
+    Signature:
+        Inputs: self
+        Outputs:
+            table (Pyarrow Table): same columns as to_frame, numeric columns are wrapped without a copy
+    Purpose: To hand the trades over to arrow based tools (parquet files, sweeps etc.)
+    """
+    def to_arrow(self):
+        import pyarrow as pa ##Optional dependency, only needed for this method
+        return pa.table({column: self._columns[column][:self._size] for column in self.COLUMNS})
+
+    """
+    Signature:
+        Inputs:
+            dict_signal (Dictionary): of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}}
+        Outputs:
+            ledger (TradeLedger): one row per key of dict_signal, in the order of the dictionary
+    Purpose: To convert the output of the day walk engine (update_dict_signal) into a ledger in a single pass
+    """
+    @classmethod
+    def from_dict_signal(cls, dict_signal):
+        ledger = cls(capacity = len(dict_signal))
+        for date, value in dict_signal.items():
+            ledger.append(date, value.get("Instrument"), value.get("Buy Price"), value.get("Buy Execution Cost"), value.get("Sell Price"), value.get("Sell Execution Cost"))
+        return ledger
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+    ##Private helper - (re)allocates every column to the new capacity, keeping the rows we already have
+    def _allocate(self, capacity):
+        dtypes = {"Date": "datetime64[s]", "Instrument": object} ##Seconds resolution as pandas wraps it without a copy
+        for column in self.COLUMNS:
+            new_array = np.full(capacity, np.datetime64("NaT") if column == "Date" else (None if column == "Instrument" else np.nan), dtype=dtypes.get(column, np.float64))
+            if column in self._columns:
+                new_array[:self._size] = self._columns[column][:self._size]
+            self._columns[column] = new_array
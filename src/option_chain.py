@@ -0,0 +1,193 @@
+##Importing the relevant libraries/packages
+import pandas as pd
+import numpy as np
+
+##Setting up the logger
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Type/Interpretation - OptionChain is one preprocessed day of options data, indexed once so that the signal functions do lookups instead of boolean masks over the full day
+    The only index built up front is the rows of the day sorted by minute (one stable argsort) plus the offset of every minute in that order (np.unique),
+    a lookup binary searches the minute and then compares the few rows of that minute, so it gives the FIRST matching row of the day (same row as df[mask].values[0] would give)
+    Nothing is built per row in python, and the columns a lookup compares on are only turned into numpy arrays on first use
+It will have the following attributes:
+- df (Pandas DF): the day it was built from (not copied)
+- date (Pandas Timestamp): the trading date of the day, such as Timestamp("2022-01-03")
+- day_key (Int): days since 1970-01-01 of date, minute keys of the day are day_key*1440 + minute of the day
+- minute_keys (Numpy int64 array): minute key of every row
+"""
+class OptionChain():
+    def __init__(self, df_day, date_column="_timestamp", column_instrument="_instrumentname", column_expiry="Expiry", column_option_type="Option Type",
+                 column_strike_price="Strike Price", column_tag="Tag"):
+        if len(df_day) == 0:
+            logger.error("Cannot build an OptionChain from an empty day")
+            raise ValueError("Cannot build an OptionChain from an empty day")
+        self.df = df_day
+        if "minute_key" in df_day.columns:
+            self.minute_keys = df_day["minute_key"].values.astype(np.int64)
+        else:
+            ##Days without the time keys (data_operations.add_time_keys), we parse the timestamps once here
+            self.minute_keys = pd.to_datetime(df_day[date_column]).values.astype("datetime64[m]").astype(np.int64)
+        self.date = pd.Timestamp(df_day["date"].iloc[0]) if "date" in df_day.columns else pd.Timestamp(self.minute_keys[0]*60, unit="s").normalize()
+        self.day_key = (self.date.normalize() - pd.Timestamp("1970-01-01")).days
+        self._columns = {}
+        self._column_names = {"instrument": column_instrument, "expiry": column_expiry, "option_type": column_option_type, "strike": column_strike_price, "tag": column_tag}
+        ##Stable sort, so the rows of a minute keep the order of the day and the first match within a minute is the first match of the day
+        self._order = np.argsort(self.minute_keys, kind="stable")
+        self._minutes, self._starts = np.unique(self.minute_keys[self._order], return_index=True)
+        self._ends = np.append(self._starts[1:], len(self._order))
+
+    """
+    TEMPLATE
+    -- FIELDS
+    .....self.df    .....PANDAS DF
+    .....self.date    .....PANDAS TIMESTAMP
+    .....self.day_key    .....INT
+    .....self.minute_keys    .....NUMPY INT64 ARRAY
+    .....self._order    .....NUMPY INT64 ARRAY (rows sorted by minute key)
+    .....self._minutes    .....NUMPY INT64 ARRAY (distinct minute keys of the day, sorted)
+    .....self._starts, self._ends    .....NUMPY INT64 ARRAYS (rows of self._minutes[i] are self._order[self._starts[i]:self._ends[i]])
+
+    -- METHODS:
+    .....self.minute_key(self, time): .... minute_key (INT)
+    .....self.row_at(self, time): .... row (INT or None)
+    .....self.instrument_row(self, instrument, time): .... row (INT or None)
+    .....self.contract_row(self, time, expiry, option_type, strike): .... row (INT or None)
+    .....self.atm_row(self, time, expiry, option_type): .... row (INT or None)
+    .....self.value(self, row, column): .... value
+    .....self.ohlc(self, row): .... (open, high, low, close) (TUPLE OF FLOATS)
+    """
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+    """
+    Signature:
+        Inputs:
+            time (String/Int): time of day such as "09:16:00", or a minute key already
+        Outputs:
+            minute_key (Int): key of that minute on the day of the chain
+    Purpose: All lookups take a time of day, this turns it into the key the indexes are built on
+    """
+    def minute_key(self, time):
+        if isinstance(time, (int, np.integer)):
+            return int(time)
+        parts = str(time).split(":")
+        return self.day_key*24*60 + int(parts[0])*60 + int(parts[1])
+
+    """
+    Signature:
+        Inputs:
+            time (String/Int): same as minute_key
+        Outputs:
+            row (Int): position of the first row of the day at that minute, None if there is no row
+    Purpose: For values which are the same for every row of a minute, such as the spot price
+    """
+    def row_at(self, time):
+        rows = self._minute_rows(time)
+        return int(rows[0]) if len(rows) > 0 else None
+
+    """
+    Signature:
+        Inputs:
+            instrument (String): such as "NIFTY06JAN2217650CE"
+            time (String/Int): same as minute_key
+        Outputs:
+            row (Int): position of the row of that instrument at that minute, None if it did not trade
+    Purpose: For e.g. "the OHLC of the instrument we hold at 09:16"
+    """
+    def instrument_row(self, instrument, time):
+        rows = self._minute_rows(time)
+        return self._first(rows, self._equals("instrument", rows, str(instrument)))
+
+    """
+    Signature:
+        Inputs:
+            time (String/Int): same as minute_key
+            expiry (String/Date): such as "2022-01-06"
+            option_type (String): "CE" or "PE"
+            strike (Float): such as 17650
+        Outputs:
+            row (Int): position of the row of that contract at that minute, None if it did not trade
+    Purpose: Lookup of a contract by its terms instead of its name
+    """
+    def contract_row(self, time, expiry, option_type, strike):
+        rows = self._minute_rows(time)
+        strikes = self._array(self._column_names["strike"])[rows]
+        return self._first(rows, self._equals("expiry", rows, self._key(expiry)) & self._equals("option_type", rows, str(option_type)) & (strikes == strike))
+
+    """
+    Signature:
+        Inputs:
+            time (String/Int): same as minute_key
+            expiry (String/Date): such as "2022-01-06"
+            option_type (String): "CE" or "PE"
+        Outputs:
+            row (Int): position of the first row tagged "ATM" for that minute, expiry and option type, None if there is none
+    Purpose: For e.g. "the ATM CE of the nearest expiry at 15:20"
+    """
+    def atm_row(self, time, expiry, option_type):
+        if self._column_names["tag"] not in self.df.columns:
+            return None
+        rows = self._minute_rows(time)
+        return self._first(rows, self._equals("tag", rows, "ATM") & self._equals("expiry", rows, self._key(expiry)) & self._equals("option_type", rows, str(option_type)))
+
+    """
+    Signature:
+        Inputs:
+            row (Int): a position returned by one of the lookups
+            column (String): such as "spot_open_price"
+        Outputs:
+            value: value of the column at that row
+    Purpose: To read single values without going through pandas indexing (columns are turned into numpy arrays once, on first use)
+    """
+    def value(self, row, column):
+        return self._array(column)[row]
+
+    """
+    Signature:
+        Inputs:
+            row (Int): a position returned by one of the lookups
+        Outputs:
+            (open, high, low, close) (Tuple of floats): prices of the option at that row, as python floats (float64) even if the day is float32 (compact schema)
+    Purpose: The prices the execution models need, pricing is always done in float64
+    """
+    def ohlc(self, row):
+        return tuple(float(self.value(row, column)) for column in ["_open", "_high", "_low", "_close"])
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+    ##Private helpers - lookups compare plain python strings, whether the column is object or categorical, and expiries are "YYYY-MM-DD"
+    def _array(self, column):
+        ##Numpy array (or Categorical) of the column, built on first use
+        if column not in self._columns:
+            self._columns[column] = self.df[column].values
+        return self._columns[column]
+
+    def _minute_rows(self, time):
+        ##Rows of the day at that minute, in the order of the day
+        key = self.minute_key(time)
+        i = np.searchsorted(self._minutes, key)
+        if i == len(self._minutes) or self._minutes[i] != key:
+            return self._order[:0]
+        return self._order[self._starts[i]:self._ends[i]]
+
+    def _equals(self, name, rows, value):
+        ##Boolean mask of rows where the column (by its role, such as "expiry") equals the string value, categoricals are compared on their codes
+        values = self._array(self._column_names[name])
+        if isinstance(values, pd.Categorical):
+            code = values.categories.get_indexer([value])[0] if values.categories.dtype == object else -1
+            if code == -1:
+                return values[rows].astype(str) == value
+            return values.codes[rows] == code
+        return values[rows].astype(str) == value
+
+    @staticmethod
+    def _first(rows, mask):
+        matches = np.flatnonzero(mask)
+        return int(rows[matches[0]]) if len(matches) > 0 else None
+
+    @staticmethod
+    def _key(value):
+        if isinstance(value, str):
+            return value
+        return str(pd.Timestamp(value).date())
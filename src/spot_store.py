@@ -0,0 +1,175 @@
+##Importing the relevant libraries/packages
+import pandas as pd
+import numpy as np
+import os
+import json
+
+##Setting up the logger
+import logging
+logger = logging.getLogger(__name__)
+
+"""
+Type/Interpretation - SpotStore is the spot series (minute by minute OHLC) parsed and deduplicated once, and indexed by an int64 minute key
+    minute key = minutes since 1970-01-01 00:00 (naive exchange time), so the "01-01-2022 09:15" candle has key 27349395
+It replaces handing the full df_spot to add_spot_price for every day (which re-parsed, deduplicated and re-indexed the whole file on every call)
+It will have the following attributes:
+- minute_keys (Numpy int64 array): sorted, unique minute keys
+- prices (Dictionary): {"open": float64 array, "high": ..., "low": ..., "close": ...} aligned with minute_keys
+"""
+class SpotStore():
+    FIELDS = ["open", "high", "low", "close"]
+
+    def __init__(self, minute_keys, prices):
+        self.minute_keys = np.asarray(minute_keys, dtype=np.int64)
+        self.prices = {field: np.asarray(prices[field], dtype=np.float64) for field in self.FIELDS if field in prices}
+        if len(self.minute_keys) > 1 and not (np.diff(self.minute_keys) > 0).all():
+            logger.error("SpotStore minute keys must be sorted and unique")
+            raise ValueError("SpotStore minute keys must be sorted and unique")
+
+    """
+    TEMPLATE
+    -- FIELDS
+    .....self.minute_keys    .....NUMPY INT64 ARRAY
+    .....self.prices    .....DICT {field: NUMPY FLOAT64 ARRAY}
+
+    -- METHODS:
+    .....SpotStore.from_df(df_spot, date_column_spot, date_format): .... SpotStore
+    .....SpotStore.load_or_build(spot_path, store_dir, date_column_spot, date_format): .... SpotStore
+    .....SpotStore.minute_key(timestamps): .... (minute_keys (NUMPY INT64 ARRAY), valid (NUMPY BOOL ARRAY))
+    .....self.lookup(self, timestamps, fields): .... {field: NUMPY FLOAT64 ARRAY}
+    .....self.get(self, timestamp, field): .... price (FLOAT)
+    .....self.save(self, path): .... path (STRING)
+    .....SpotStore.load(path): .... SpotStore
+    """
+
+    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+    """
+    Signature:
+        Inputs:
+            df_spot (Pandas DF): spot data with the columns "open", "high", "low", "close" and a date column
+            date_column_spot (String): name of the date column, such as "date"
+            date_format (String): Optional argument - format of the date column, "%d-%m-%Y %H:%M" by default (same as add_spot_price)
+        Outputs:
+            spot_store (SpotStore)
+    Purpose: To parse, deduplicate and index the spot file once, duplicates keep the last row (same as add_spot_price), rows with unparseable dates are dropped
+    """
+    @classmethod
+    def from_df(cls, df_spot, date_column_spot="date", date_format="%d-%m-%Y %H:%M"):
+        timestamps = pd.to_datetime(df_spot[date_column_spot], format=date_format)
+        keys, valid = cls.minute_key(timestamps)
+        df_keyed = pd.DataFrame({"minute_key": keys[valid], **{field: df_spot[field].values[valid] for field in cls.FIELDS if field in df_spot.columns}})
+        df_keyed = df_keyed.drop_duplicates(subset=["minute_key"], keep="last").sort_values("minute_key", kind="stable")
+        logger.info(f"Spot store built with {len(df_keyed)} minutes ({len(df_spot) - len(df_keyed)} duplicate/invalid rows dropped)")
+        return cls(df_keyed["minute_key"].values, {field: df_keyed[field].values for field in cls.FIELDS if field in df_keyed.columns})
+
+    """
+    Signature:
+        Inputs:
+            spot_path (String): path of the spot csv
+            store_dir (String): folder in which the parsed store is persisted (usually the parquet store, next to the expiry catalog)
+            date_column_spot, date_format (String): same as from_df
+        Outputs:
+            spot_store (SpotStore)
+    Purpose: To read the persisted spot store (spot.parquet + _spot.json in store_dir), and rebuild it from spot_path if it is missing or the csv has changed since
+    """
+    @classmethod
+    def load_or_build(cls, spot_path, store_dir, date_column_spot="date", date_format="%d-%m-%Y %H:%M"):
+        parquet_path, meta_path = os.path.join(store_dir, "spot.parquet"), os.path.join(store_dir, "_spot.json")
+        stat = os.stat(spot_path)
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "date_column": date_column_spot, "date_format": date_format}
+        if os.path.exists(meta_path) and os.path.exists(parquet_path):
+            with open(meta_path) as f:
+                if json.load(f).get("fingerprint") == fingerprint:
+                    return cls.load(parquet_path)
+            logger.info(f"Spot store in {store_dir} is stale, rebuilding it")
+        spot_store = cls.from_df(pd.read_csv(spot_path), date_column_spot, date_format)
+        os.makedirs(store_dir, exist_ok=True)
+        spot_store.save(parquet_path)
+        ##Json is written last (and atomically), so a matching fingerprint always has its parquet file next to it
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"source": os.path.abspath(spot_path), "fingerprint": fingerprint}, f, indent=1)
+        os.replace(meta_path + ".tmp", meta_path)
+        return spot_store
+
+    """
+    Signature:
+        Inputs:
+            timestamps (Array like): datetimes (or strings pandas can parse, such as "2022-01-03 09:15:00"), or int64 minute keys already
+        Outputs:
+            minute_keys (Numpy int64 array): minute key of every timestamp
+            valid (Numpy bool array): False where the timestamp is missing or not on a whole minute (those can never match a spot candle)
+    Purpose: To convert timestamps to minute keys in one vectorised step
+    """
+    @staticmethod
+    def minute_key(timestamps):
+        values = np.asarray(timestamps)
+        if values.dtype.kind in "iu":
+            return values.astype(np.int64), np.ones(len(values), dtype=bool)
+        seconds = pd.to_datetime(pd.Series(values)).values.astype("datetime64[s]")
+        valid = ~np.isnat(seconds)
+        seconds = seconds.astype(np.int64)
+        valid &= seconds % 60 == 0
+        return seconds // 60, valid
+
+    """
+    Signature:
+        Inputs:
+            timestamps (Array like): same as minute_key
+            fields (Iterable of Strings): Optional argument - which prices we want, ("open",) by default
+        Outputs:
+            prices (Dictionary): {field: float64 array aligned with timestamps}, NaN where the spot file has no candle
+    Purpose: Bulk lookup of spot prices, one binary search per timestamp over the sorted keys (no parsing, no index building)
+    """
+    def lookup(self, timestamps, fields=("open",)):
+        keys, valid = self.minute_key(timestamps)
+        if len(self.minute_keys) == 0:
+            return {field: np.full(len(keys), np.nan) for field in fields}
+        ##searchsorted gives where the key would go, it is a hit only if the key at that position is the same minute
+        positions = np.minimum(np.searchsorted(self.minute_keys, keys), len(self.minute_keys) - 1)
+        found = valid & (self.minute_keys[positions] == keys)
+        return {field: np.where(found, self.prices[field][positions], np.nan) for field in fields}
+
+    """
+    Signature:
+        Inputs:
+            timestamp (Datetime/String/Int): a single timestamp or minute key
+            field (String): Optional argument - "open" by default
+        Outputs:
+            price (Float): NaN if the spot file has no candle at that minute
+    Purpose: Scalar version of lookup
+    """
+    def get(self, timestamp, field="open"):
+        return float(self.lookup([timestamp], (field,))[field][0])
+
+    def __len__(self):
+        return len(self.minute_keys)
+
+    """
+    Signature:
+        Inputs:
+            path (String): parquet file to write, such as ".../Parquet Store/spot.parquet"
+        Outputs:
+            path (String): same as the input
+    Purpose: To persist the parsed store (minute_key + price columns), written to a temp file first and then renamed
+    """
+    def save(self, path):
+        pd.DataFrame({"minute_key": self.minute_keys, **self.prices}).to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        return path
+
+    """
+    Signature:
+        Inputs:
+            path (String): parquet file written by save
+        Outputs:
+            spot_store (SpotStore)
+    Purpose: To load a persisted store without parsing a single date string
+    """
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            logger.error(f"Spot store not found: {path}")
+            raise FileNotFoundError(f"Spot store not found: {path}")
+        df_keyed = pd.read_parquet(path)
+        return cls(df_keyed["minute_key"].values, {field: df_keyed[field].values for field in cls.FIELDS if field in df_keyed.columns})
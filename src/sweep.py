@@ -0,0 +1,171 @@
+##Importing the relevant libraries/packages
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed ##For running the parameter combinations in parallel
+from analytics import Metrics
+
+##Settingup the logger
+import logging
+logger = logging.getLogger(__name__)
+
+
+##WE DECIDED TO NOT HAVE A CLASS HERE AS NO ATTRIBUTES WILL BE NEEDED, the strategy specific part (what one combination does) is passed in as a function
+
+##Headline numbers from Metrics which we collect for every combination, all of them for the return type of the sweep (gross/execution/net)
+HEADLINE_METRICS = ["total_return_pct", "cagr_return_pct", "max_drawdown_pct", "calmar_ratio", "sharpe_ratio", "sortino_ratio",
+                    "max_drawdown_duration_days", "winrate_pct", "avg_win_pct", "avg_loss_pct", "expectancy_pct"]
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        param_space (Dictionary): of type {parameter name: list of values}, for e.g. {"THRESHOLD": [25, 50], "SLIPPAGE": [0.005, 0.01]}
+    Output:
+        combinations (List of Dictionaries): every combination of the values, such as [{"THRESHOLD": 25, "SLIPPAGE": 0.005}, {"THRESHOLD": 25, "SLIPPAGE": 0.01}, ...]
+Purpose: To generate the full grid of parameter combinations for a sweep
+"""
+def parameter_grid(param_space):
+    names = list(param_space)
+    return [dict(zip(names, values)) for values in itertools.product(*[param_space[name] for name in names])]
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        param_space (Dictionary): same as parameter_grid
+        n_samples (Int): number of combinations we want
+        seed (Int): Optional argument - seed of the random generator, so that a resumed sweep draws the same combinations
+    Output:
+        combinations (List of Dictionaries): n_samples distinct combinations drawn from the grid (the whole grid if it has fewer than n_samples)
+Purpose: To sample a random subset of a grid which is too large to run in full, without building the grid in memory
+"""
+def parameter_random(param_space, n_samples, seed=None):
+    names = list(param_space)
+    sizes = [len(param_space[name]) for name in names]
+    grid_size = int(np.prod(sizes, dtype=np.float64))
+    if n_samples >= grid_size:
+        return parameter_grid(param_space)
+    rng = np.random.default_rng(seed)
+    ##Every combination is a number in [0, grid_size), we draw distinct numbers and decode them digit by digit (mixed radix, one digit per parameter)
+    picks = rng.choice(grid_size, size=n_samples, replace=False)
+    combinations = []
+    for pick in picks:
+        combination = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            pick, index = divmod(int(pick), size)
+            combination[name] = param_space[name][index]
+        combinations.append({name: combination[name] for name in names})
+    return combinations
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        params (Dictionary): one parameter combination
+    Output:
+        key (String): canonical json of the combination, such as '{"SLIPPAGE": 0.01, "THRESHOLD": 25}'
+Purpose: To identify a combination in the results file, this is what lets us resume a sweep
+"""
+def combination_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        df_results (Pandas DF): output of results_final for one combination, with columns date, gross_pnl, execution_pnl, net_pnl
+        initial_capital (Float): same as Metrics
+        return_type (String): Should be one of "gross", "execution", "net"
+    Output:
+        headline (Dictionary): {"total_trades": 779, "total_return_pct": 0.12, ...} for every metric in HEADLINE_METRICS
+Purpose: To reduce one backtest to the numbers we compare combinations on
+"""
+def metrics_headline(df_results, initial_capital, return_type="execution"):
+    if return_type not in ["gross", "execution", "net"]:
+        logger.error(f"Invalid return_type: {return_type}")
+        raise ValueError("return_type must be 'gross', 'execution', or 'net'")
+    position = ["gross", "execution", "net"].index(return_type)
+    metrics = Metrics(df_results, initial_capital)
+    headline = {"total_trades": int(metrics.total_trades())}
+    for name in HEADLINE_METRICS:
+        headline[name] = float(getattr(metrics, name)()[position])
+    return headline
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        results_path (String): path of the results csv of a sweep
+    Output:
+        completed (Set of Strings): combination_key of every combination which is already in the file (empty if the file does not exist)
+Purpose: To find what a previous (interrupted) run of the sweep already finished
+"""
+def load_completed(results_path):
+    if not os.path.exists(results_path):
+        return set()
+    return set(pd.read_csv(results_path, usecols=["key"])["key"])
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs:
+        evaluate (Function): takes one combination (Dictionary) and returns a dictionary of numbers (for e.g. metrics_headline), should be a module level function so that it can be sent to the workers
+        combinations (List of Dictionaries): output of parameter_grid/parameter_random
+        results_path (String): csv file the results are appended to, one row per combination as soon as it finishes
+        num_workers (Int): Optional argument - number of worker processes, by default os.cpu_count(), 1 (or less) runs everything in this process
+        initializer, initargs: Optional arguments - run once in every worker before any combination (for e.g. to hand over the preprocessed data once instead of once per combination)
+        log_every (Int): Optional argument - log progress every log_every combinations, by default about every 5% of the sweep
+    Output:
+        df_sweep (Pandas DF): every row of results_path (this and previous runs), with columns key, the parameters, the outputs of evaluate and seconds
+Purpose: To run a parameter sweep in a process pool
+    Combinations already in results_path are skipped, so rerunning the same sweep resumes it, failed combinations are logged and not written (and are retried on the next run)
+"""
+def run_sweep(evaluate, combinations, results_path, num_workers=None, initializer=None, initargs=(), log_every=None):
+    completed = load_completed(results_path)
+    todo = [params for params in combinations if combination_key(params) not in completed]
+    logger.info(f"Sweep of {len(combinations)} combinations, {len(combinations) - len(todo)} already in {results_path}, running {len(todo)}")
+    if todo:
+        os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = min(num_workers, len(todo))
+        if log_every is None:
+            log_every = max(1, len(todo) // 20)
+        if num_workers <= 1:
+            if initializer is not None:
+                initializer(*initargs)
+            _collect((_run_combination(evaluate, params) for params in todo), len(todo), results_path, log_every)
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=initializer, initargs=initargs) as executor:
+                futures = [executor.submit(_run_combination, evaluate, params) for params in todo]
+                _collect((future.result() for future in as_completed(futures)), len(todo), results_path, log_every)
+    return pd.read_csv(results_path) if os.path.exists(results_path) else pd.DataFrame()
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+##Private helpers for run_sweep
+
+def _run_combination(evaluate, params):
+    start = time.perf_counter()
+    try:
+        return params, evaluate(params), None, time.perf_counter() - start
+    except Exception as error:
+        return params, None, repr(error), time.perf_counter() - start
+
+def _collect(outcomes, total, results_path, log_every):
+    start, done, failed = time.perf_counter(), 0, 0
+    for params, result, error, seconds in outcomes:
+        done += 1
+        if error is not None:
+            failed += 1
+            logger.error(f"Combination {params} failed: {error}")
+        else:
+            row = pd.DataFrame([{"key": combination_key(params), **params, **result, "seconds": round(seconds, 3)}])
+            ##Appending every row as it comes, so that whatever finished survives an interrupted sweep
+            row.to_csv(results_path, mode="a", header=not os.path.exists(results_path), index=False)
+        if done % log_every == 0 or done == total:
+            elapsed = time.perf_counter() - start
+            logger.info(f"Sweep progress: {done}/{total} ({failed} failed), {elapsed:.1f}s elapsed, ETA {elapsed/done*(total - done):.1f}s")
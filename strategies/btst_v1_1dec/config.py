@@ -10,6 +10,7 @@ import settings
 
 #--------------------------------------------------------------GENERIC CONFIGS----------------------------------------------------------------------------------------#
 LOG_LEVEL = settings.LOG_LEVEL   # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL ##Currently inheriting from settings.py, but can override
+NUM_WORKERS = settings.DEFAULT_NUM_WORKERS ##For steps 4-8, number of processes which load and preprocess the days in parallel ##Currently inheriting from settings.py, but can override
 # Strategy identification (define once, reuse everywhere)
 STRATEGY_FOLDER = "btst_v1_1dec"  # For folder paths to be reused in paths
 
@@ -17,6 +18,7 @@ STRATEGY_FOLDER = "btst_v1_1dec"  # For folder paths to be reused in paths
 LOG_DIR = os.path.join(settings.LOGS_DIR, STRATEGY_FOLDER) ##to be used for logger setup (step 0)
 PATH_SMALLER_FILES = os.path.join(settings.DATA_DIR, "Nifty", "Smaller Files") ##For step 1, to check whether folder already exists or not
 PATH_LARGE_FILE = os.path.join(settings.DATA_DIR, "Nifty", "NIFTY_Options.csv") ## For step 1, the path where our larger file is located
+PATH_STORE = os.path.join(settings.DATA_DIR, "Nifty", "Parquet Store") ##For step 1, the parquet store we read from when DATA_FORMAT is "parquet"
 PATH_NIFTY_SPOT =  os.path.join(settings.DATA_DIR, "Nifty", "NIFTY_Spot.csv") #For spot 6, where we will map spot price in our list of df
 RESULTS_FINAL_PATH = os.path.join(settings.RESULTS_DIR, STRATEGY_FOLDER) ##For step 11, where we will store 3 things (PDF report, results csv, and equity + dd curve png file)
 
@@ -32,25 +34,64 @@ INSTRUMENT_COLUMN_NAME = "_instrumentname" ##For step 2, where we will extract e
 ##Data filtering
 START_DATE = "2022-01-03" ## For step 1, we will create files only starting 3rd Jan 22
 LIST_TIMESTAMPS = ["09:16:00", "15:20:00"] ##For step 5, where we want to drop all rows which are not in the given list for efficiency
+DATA_FORMAT = "parquet" ##For step 1/3/4, "parquet" reads the day data from the parquet store, "csv" from the smaller files folder
+COMPACT_SCHEMA = False ##For steps 4-8, load every day with the compact dtypes of data_operations.COMPACT_SCHEMA (categorical symbols, float32 prices, int32 strikes), roughly 3-5x less memory ##Off by default, float32 prices move the pnl by ~1e-7 relative (pricing itself is done in float64)
+PUSHDOWN_TIMES = True ##For step 4/5, read only the rows at LIST_TIMESTAMPS from the parquet store (row groups of other minutes are skipped on disk), ignored for "csv"
+STORE_ROW_GROUP_MINUTES = 15 ##For step 1, minutes of a day per parquet row group when the store is built, smaller means finer skipping but more row groups
+STRIKE_WINDOW = None ##For step 4, keep only strikes within STRIKE_WINDOW strikes of the spot at that minute (e.g. 20 with STRIKE_STEP 50 is spot ± 1000 points), None keeps every strike
+    ##Keep it wide, the strike bought at 15:20 is sold the next morning after the overnight move, and has to still be in the window then
+STRIKE_STEP = 50 ##For step 4, gap between two NF strikes, STRIKE_WINDOW is counted in these
 
 #--------------------------------------------------------------STRAT SPECIFIC CONFIGS-----------------------------------------------------------------------------------#
 ##These include strat sepcfic configs such as what should be entry time, exit time, 
 THRESHOLD = 25 ## Fdr step 8, to determine the threshold beyond which a strike is or is not ATM
+ATM_SELECTION = "threshold" ##For step 8, "threshold" tags every strike within THRESHOLD of spot as ATM, "nearest" tags only the single nearest strike per minute and expiry (THRESHOLD is then not used)
 MORNING_TIME =  "09:16:00" ##For step 9, where we are running our updte_dict_signal function to actually create the data_dict with values
 EVENING_TIME =   "15:20:00" ##For step 9, where we are running our updte_dict_signal function to actually create the data_dict with values
 OPTION_EXIT_TIME = "09:16:00" ##For step 9, where we are running our updte_dict_signal function to actually create the data_dict with values
 OPTION_ENTRY_TIME = "15:20:00" ##For step 9, where we are running our updte_dict_signal function to actually create the data_dict with values
+SIGNAL_ENGINE = "vectorized" ##For step 9, "vectorized" runs signals_vectorized on chunks of streamed days, "loop" walks the days one by one through update_dict_signal_stream
+SIGNAL_CHUNK_DAYS = 250 ##For step 9, number of days the vectorized engine joins into one df at a time (bigger chunks are faster, smaller ones use less memory)
 SLIPPAGE = settings.DEFAULT_SLIPPAGE ##For step 9, where we are running our updte_dict_signal function to actually create the data_dict with values
+EXECUTION_MODEL = settings.DEFAULT_EXECUTION_MODEL ##For step 9, batched pricing model used by both signal engines ("simple_avg", "fixed_tick", "range_pct", "volume_impact")
+TICK_SIZE = settings.DEFAULT_TICK_SIZE ##For step 9, only used by the fixed_tick model
+SPREAD_TICKS = settings.DEFAULT_SPREAD_TICKS ##For step 9, only used by the fixed_tick model
+RANGE_PCT = settings.DEFAULT_RANGE_PCT ##For step 9, only used by the range_pct model
+IMPACT_REFERENCE_VOLUME = None ##For step 9, only used by the volume_impact model, None means the median volume of the fills being priced
 INITIAL_CAPITAL = settings.DEFAULT_INITIAL_CAPITAL ##For step 11, where we transform pct wise data in results_df in absolute pnl 
 RPT = settings.DEFAULT_RPT ##For step 11, where we transform pct wise data in results_df in absolute pnl 
 
 #--------------------------------------------------------------OUTPUT SPECIFIC CONFIGS-----------------------------------------------------------------------------------#
 ##These include params such as what should be output file name/report name etc. (does not directly impact logic of the strategy)
 DIRNAME = "Smaller Files" ##For step 1, where we want to create a directory
+STORE_DIRNAME = "Parquet Store" ##For step 1, where we want to create the parquet store (should match the folder name in PATH_STORE)
+INCREMENTAL_INGEST = True ##For step 1, if the store/smaller files already exist, add the days which are new in PATH_LARGE_FILE (days already there are never rewritten)
+SPLIT_CHUNK_SIZE = 500000 ##For step 1, rows of the large file read in one go while splitting it (bigger is faster, at the cost of memory)
+SPLIT_WRITERS = 1 ##For step 1, processes which write the smaller files in parallel (csv formatting is the slow part), 1 writes in the main process
 STRATEGY_NAME = "BTST_V1_1DEC" ##For step 12, where we generate the final report
 LOGIC = "If evening spot price > morning spot price, but ATM CE, else buy ATM PE" ##For step 12, where we generate the final report
 RETURN_TYPE = "gross" ##For step 12, we want to generate report for gross returns
 REPORT_NAME = "BTST_V1_1DEC_GROSS_2.pdf"
+ROLLING_WINDOW = 60 ##For step 12, window of the rolling metrics chart in the report, last N trades (int), a calendar window such as "90D", or None to leave the chart out
+REPORT_CHART_FORMAT = "png" ##For step 12, "png" renders the charts with matplotlib, "vector" draws them straight into the pdf (no raster, several times faster)
+
+#--------------------------------------------------------------SWEEP SPECIFIC CONFIGS-----------------------------------------------------------------------------------#
+##These are only used by main_sweep.py, which loads the data once and runs every combination of the values below (parameters not listed keep the values above)
+SWEEP_PARAMS = {
+    "THRESHOLD": [25, 50],
+    "MORNING_TIME": ["09:16:00", "09:30:00"],
+    "EVENING_TIME": ["15:00:00", "15:20:00"],
+    "OPTION_ENTRY_TIME": ["15:20:00"],
+    "OPTION_EXIT_TIME": ["09:16:00", "09:30:00"],
+    "SLIPPAGE": [0.005, 0.01],
+    "RPT": [0.01],
+}
+SWEEP_MODE = "grid" ##"grid" runs every combination, "random" runs SWEEP_SAMPLES combinations drawn from the grid
+SWEEP_SAMPLES = 20 ##Only used when SWEEP_MODE is "random"
+SWEEP_SEED = 42 ##Only used when SWEEP_MODE is "random", keep it fixed so that a resumed sweep draws the same combinations
+SWEEP_RETURN_TYPE = "execution" ##Which of gross/execution/net the headline metrics are computed on
+SWEEP_RESULTS_FILE = os.path.join(RESULTS_FINAL_PATH, "sweep_results.csv") ##One row per finished combination, rerunning the sweep skips the ones already in here
+SWEEP_REPORTS_TOP = 0 ##Full pdf reports for the best N combinations by sharpe once the sweep is done (rendered in parallel with NUM_WORKERS processes), 0 for none
 
 
 
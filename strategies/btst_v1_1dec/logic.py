@@ -11,6 +11,7 @@ import sys
 import numpy as np
 from functools import reduce ##reduce will help us club multiple filters together
 import operator
+import copy
 import config
 current_file = os.path.dirname(os.path.abspath(__file__))
 src_path = os.path.join(current_file, '..', '..', 'src')
@@ -18,23 +19,47 @@ sys.path.insert(0, os.path.abspath(src_path))
 
 # Now import your functions
 from execution import Execution
+from ledger import TradeLedger
+from option_chain import OptionChain
+import data_operations as data
 
 ##Creating the object for using the Execution methods (and using the slippage from config files)
-execution = Execution(config.SLIPPAGE)
+execution = Execution(config.SLIPPAGE, tick_size = config.TICK_SIZE, spread_ticks = config.SPREAD_TICKS, range_pct = config.RANGE_PCT,
+                      reference_volume = config.IMPACT_REFERENCE_VOLUME)
 
 ##Defining our logger
 import logging
 logger = logging.getLogger(__name__)
 
+##Private helper - the signal functions below take a day either as a df or as an OptionChain (option_chain.py) which was already built for it
+##so that update_dict_signal_day indexes the day once and not once per function
+def _chain(df_options):
+    return df_options if isinstance(df_options, OptionChain) else OptionChain(df_options)
+
+##Private helper - the buy side of a trade goes straight into the TradeLedger (as a new row whose exit is set later), or into a dict_signal under its date
+def _record_entry(dict_signal, date_trade, instrument, buy_price, buy_execution_cost):
+    if isinstance(dict_signal, TradeLedger):
+        dict_signal.append(date_trade, instrument, buy_price, buy_execution_cost)
+    else:
+        dict_signal[date_trade] = {"Instrument": instrument, "Buy Price": buy_price, "Buy Execution Cost": buy_execution_cost}
+
+##Private helper - prices one fill of the day walk with config.EXECUTION_MODEL, through the same Execution.price_batch as the vectorized engine (on length 1 arrays)
+##so that both engines give the same prices whatever the model
+def _price_fill(chain, row, side):
+    open_price, high_price, low_price, close_price = [np.array([price]) for price in chain.ohlc(row)]
+    volume = np.array([chain.value(row, "_volume")], dtype=np.float64) if "_volume" in chain.df.columns else None
+    execution_price, execution_cost = execution.price_batch(config.EXECUTION_MODEL, side, open_price, high_price, low_price, close_price, volume)
+    return float(execution_price[0]), float(execution_cost[0])
+
 """
 Singature:
     Inputs:
-        df_options (Pandas df): The df from which we will capture the spot price values, it must have the following values/columns:
+        df_options (Pandas df or OptionChain): The df from which we will capture the spot price values, it must have the following values/columns:
             "_timestamp" colunm which will have string level datetimestamp values such as "2024-01-25 09:16:00"
             "spot_open_price" column which will have float level valyes for spot price at the given stamp
         morning_time (String): Should be in string format but representing time such as "09:16:00"
         evening_time (String): Should be in string format but representing time such as "15:16:00"
-        date (String): Should be of the form String of format: "YYYY-MM-DD"
+        date (String): Should be of the form String of format: "YYYY-MM-DD" (the date of the df, kept for the callers, the chain knows its own date)
     Outputs:
         (morning_price, evening_price) (Tuple of floats):  will return the price of spot as a tuple for the given two values of morning and evening times
 Purpose: 
@@ -43,16 +68,17 @@ Purpose:
 """
 
 def get_entry_exit_spot(df_options, morning_time, evening_time, date):
-    ##We first get the filtered timeframes (this is done to ensure there are no empty vales for spot)
-    evening_filtered = df_options[df_options["_timestamp"] == date+" "+evening_time]  # ADDED
-    morning_filtered = df_options[df_options["_timestamp"] == date+" "+morning_time]  # ADDED
+    chain = _chain(df_options)
+    ##We first get the first row at both times (this is done to ensure there are no empty vales for spot)
+    evening_row = chain.row_at(evening_time)
+    morning_row = chain.row_at(morning_time)
     ##If we cannt find morning or evening spot price we will return None
-    if len(evening_filtered) == 0 or len(morning_filtered) == 0:  # ADDED
+    if evening_row is None or morning_row is None:  # ADDED
         logger.warning(f"Missing spot price for {date}")  # ADDED
         return None, None  # ADDED
     ##Else we will return the spot open price
-    evening_price = evening_filtered["spot_open_price"].values[0]  # CHANGED
-    morning_price = morning_filtered["spot_open_price"].values[0]  # CHANGED
+    evening_price = chain.value(evening_row, "spot_open_price")  # CHANGED
+    morning_price = chain.value(morning_row, "spot_open_price")  # CHANGED
     return (morning_price, evening_price)
 
 #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
@@ -60,7 +86,7 @@ def get_entry_exit_spot(df_options, morning_time, evening_time, date):
 """
 Singature:
     Inputs:
-        df_options(Pandas df): The df on which we will operate on, should have the following fields which we will be using:
+        df_options(Pandas df or OptionChain): The df on which we will operate on, should have the following fields which we will be using:
             Column "_timestamp" of string/object dtype which will have values of type "2024-01-25 15:20:00"
             Column "Tag" of object type: - which will have "ATM" for a strike which is ATM, or will have None
             Column "Option Type" of object type - which will have either CE or PE
@@ -69,6 +95,7 @@ Singature:
             Column "nearest_expiry" and "next_nearest_expiry" which will be of pbject dtype but will store dates such as "2022-01-07"
         dict_signal (Dictioary):  which will be of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}} and will be updated for each day
             For dict_signal , date will be of type python date
+            Could also be a TradeLedger, then the buy is appended to it as a new row (exit left as NaN for dict_signal_sell to fill)
         signal (String): Should be either "PE" or "CE" to indicate whether we are buying a put or a call option 
         entry_time (String): Should be a string representing when we are looking to buy our ce/pe of the form "09:16:00"
     Outputs:
@@ -81,27 +108,21 @@ Purpose:
     But wll return the instrument, and the date of trade, which will serve as the input for our dict_signal_sell function
 """
 def dict_signal_buy(df_options, dict_signal, signal, entry_time):
-    ## let's first quickly define the boolean series against which we will filter our data to get the price/instrument name
-    date_trade = df_options.iloc[0]["date"].date()
-    nearest_expiry = df_options.iloc[0]["nearest_expiry"]
-    time_filter = df_options["_timestamp"] == str(df_options.iloc[0]["date"].date())+ " " + entry_time
-    tag_filter = df_options["Tag"] == "ATM"
-    option_type_filter_ce = df_options["Option Type"] == "CE"
-    option_type_filter_pe = df_options["Option Type"] == "PE"
-    ##Below we define the expiry filter basically if we are trading on the expiry day, then we will pick the instrument from next expiry, else from the same expiry
-    expiry_filter = (df_options["Expiry"] == df_options["nearest_expiry"].astype(str) 
-                 if date_trade < nearest_expiry 
-                 else df_options["Expiry"] == df_options["next_nearest_expiry"].astype(str))
-    ##Now let's update our dict_signal dictionary (we will check if data is actually there i.e. there is an instrument which satisfies all the filters)
+    ##Let's first get the day's index, every lookup below is a dictionary lookup on it
+    chain = _chain(df_options)
+    date_trade = chain.date.date()
+    nearest_expiry = chain.value(0, "nearest_expiry")
+    ##Below we pick the expiry basically if we are trading on the expiry day, then we will pick the instrument from next expiry, else from the same expiry
+    expiry = nearest_expiry if date_trade < nearest_expiry else chain.value(0, "next_nearest_expiry")
+    ##Now let's update our dict_signal dictionary (we will check if data is actually there i.e. there is an ATM instrument of the option type and expiry at entry time)
     if signal == "CE":
-        filtered = df_options[time_filter & tag_filter & option_type_filter_ce & expiry_filter]  # ADDED
-        if len(filtered) > 0:  # ADDED
-            instrument = filtered["_instrumentname"].values[0]  # CHANGED: use filtered
-            ##Getting the OHLC price to be passed into the execution function 
-            open_price, high_price, low_price, close_price = filtered["_open"].values[0], filtered["_high"].values[0], filtered["_low"].values[0], filtered["_close"].values[0]  # CHANGED: use filtered
+        row = chain.atm_row(entry_time, expiry, "CE")  # CHANGED: index lookup instead of filters
+        if row is not None:  # ADDED
+            instrument = chain.value(row, "_instrumentname")  # CHANGED: use row
             if instrument:
-                buy_price, buy_execution_cost = execution.txn_price_simple_avg("BUY", open_price, high_price, low_price, close_price)
-                dict_signal[date_trade] = {"Instrument": instrument, "Buy Price": buy_price, "Buy Execution Cost": buy_execution_cost}
+                ##Pricing the candle of the row with the configured execution model
+                buy_price, buy_execution_cost = _price_fill(chain, row, "BUY")
+                _record_entry(dict_signal, date_trade, instrument, buy_price, buy_execution_cost)
                 logger.info(f"{date_trade}: BUY CE @ {buy_price:.2f}")  # ADDED
             else:
                 logger.error(f"No ATM CE instrument {instrument} found for {date_trade}")  # CHANGED from print
@@ -109,13 +130,12 @@ def dict_signal_buy(df_options, dict_signal, signal, entry_time):
             instrument = None  # ADDED
             logger.warning(f"{date_trade}: No matching CE instrument found")  # ADDED
     elif signal == "PE":
-        filtered = df_options[time_filter & tag_filter & option_type_filter_pe & expiry_filter]  # ADDED
-        if len(filtered) > 0:  # ADDED
-            instrument = filtered["_instrumentname"].values[0]  # CHANGED: use filtered
-            open_price, high_price, low_price, close_price = filtered["_open"].values[0], filtered["_high"].values[0], filtered["_low"].values[0], filtered["_close"].values[0]  # CHANGED: use filtered
+        row = chain.atm_row(entry_time, expiry, "PE")  # CHANGED: index lookup instead of filters
+        if row is not None:  # ADDED
+            instrument = chain.value(row, "_instrumentname")  # CHANGED: use row
             if instrument:
-                buy_price, buy_execution_cost = execution.txn_price_simple_avg("BUY", open_price, high_price, low_price, close_price)
-                dict_signal[date_trade] = {"Instrument": instrument, "Buy Price": buy_price , "Buy Execution Cost": buy_execution_cost} 
+                buy_price, buy_execution_cost = _price_fill(chain, row, "BUY")
+                _record_entry(dict_signal, date_trade, instrument, buy_price, buy_execution_cost)
                 logger.info(f"{date_trade}: BUY PE @ {buy_price:.2f}")  # ADDED
             else:
                 logger.error(f"No ATM PE instrument {instrument} found for {date_trade}")  # CHANGED from print
@@ -134,9 +154,10 @@ def dict_signal_buy(df_options, dict_signal, signal, entry_time):
 """
 Signature:
     Inputs:
-        df_options(Pandas df): The df on which we will operate on, should have the same fields as we defined in dict_signal_buy
+        df_options(Pandas df or OptionChain): The df on which we will operate on, should have the same fields as we defined in dict_signal_buy
         dict_signal- which will be of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}} and will be updated for each day
             For this specific function we will update the sell price
+            Could also be a TradeLedger, then the exit is set (set_exit) on the row of date_dict
         exit_time (String): Should be a string representing when we are looking to exit our ce/pe of the form "09:16:00" the next day
         instrumentname (String): Should be a string representing the instrument we want to exit at the exit time the next day, for e.g. NIFTY06JAN2217650CE
         date_dict (Datetime python): this will be date for which we will update our dict_signal, will be of type: datetime.date(2022, 1, 3)
@@ -149,84 +170,243 @@ Purpose:
 """
 
 def dict_signal_sell(df_options, exit_time, dict_signal, instrumentname, date_dict):
-    ##Let's first define the filters against which we willl caputre our prices to be updated
-    date_trade = df_options.iloc[0]["date"].date()
-    time_filter = df_options["_timestamp"] == str(date_trade) + " " + exit_time
-    instrument_filter = df_options["_instrumentname"] == instrumentname
+    ##Let's first look up the row of the instrument at exit time, against which we willl caputre our prices to be updated
+    chain = _chain(df_options)
+    date_trade = chain.date.date()
+    row = chain.instrument_row(instrumentname, exit_time)
     
-    # Filter first, check if data exists
-    filtered = df_options[time_filter & instrument_filter]
-    
-    if date_dict not in dict_signal:  # ADDED
+    ##With a TradeLedger the open trade is found by its date (among the last rows), with a dictionary the date is the key
+    is_ledger = isinstance(dict_signal, TradeLedger)
+    ledger_row = dict_signal.find(date_dict) if is_ledger else None
+    if (is_ledger and ledger_row is None) or (not is_ledger and date_dict not in dict_signal):  # ADDED
         return dict_signal  # ADDED
     
-    if len(filtered) > 0:
-        open_price, high_price, low_price, close_price = filtered["_open"].values[0], filtered["_high"].values[0], filtered["_low"].values[0], filtered["_close"].values[0]
-        sell_price, sell_execution_cost = execution.txn_price_simple_avg("SELL",open_price, high_price, low_price, close_price)
-        dict_signal[date_dict]["Sell Price"] = sell_price
-        dict_signal[date_dict]["Sell Execution Cost"] = sell_execution_cost
+    if row is not None:
+        sell_price, sell_execution_cost = _price_fill(chain, row, "SELL")
+        if is_ledger:
+            dict_signal.set_exit(ledger_row, sell_price, sell_execution_cost)
+        else:
+            dict_signal[date_dict]["Sell Price"] = sell_price
+            dict_signal[date_dict]["Sell Execution Cost"] = sell_execution_cost
         logger.info(f"{date_trade}: SELL {instrumentname} @ {sell_price:.2f}")  # ADDED
     else:
-        dict_signal[date_dict]["Sell Price"] = None 
+        if not is_ledger:
+            dict_signal[date_dict]["Sell Price"] = None ##The ledger already has NaN for an exit which was never set
         logger.error(f"Exit failed for {instrumentname} on {date_trade}, pls discard this row")  # CHANGED from print
     return dict_signal
 #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
 
+"""
+Signature:
+    Inputs:
+        df_temp (Dataframe): a single preprocessed day, should have the same fields as we defined in dict_signal_buy
+        dict_signal (Dictioary):  which will be of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}} and will be updated for the day
+            Could also be a TradeLedger (see dict_signal_buy/dict_signal_sell), the trades are then appended to it directly
+        morning_time/evening_time (String): This is the morning time to process our spot price logic through functino get_entry_exit_spot, should be of type "09:15:00"
+        option_entry_time/option_exit_time (String): While this could be same as morning/evening time, this is actually the entry and exit time of our option which we bought and sold the next day
+        date_dict (Datetime Python): The date on which we bought the option which is still open (None if nothing is open) - should be of type datetime.date(2022, 1, 3)
+        instrumentname(String) : The name of instrument which we bought on the previous day (None if nothing is open)
+    Output:
+        dict_signal (Dictioary): updated with the buy of this day and the sell of the previous day's instrument
+        date_dict (Datetime Python): date of the buy made today (None if we did not buy), to be passed in for the next day
+        instrumentname (String): instrument bought today (None if we did not buy), to be passed in for the next day
+Purpose:
+    One step of the BTST day walk - check if evening price is higher than morning price, if yes, then buy call (else put) at entry time, and sell what we bought the previous day at exit time
+    All the state which moves from one day to the next (date_dict, instrumentname) goes in and comes out explicitly, so the walk itself is a plain loop
+"""
+
+def update_dict_signal_day(df_temp, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_dict, instrumentname):
+    date_temp = str(df_temp.iloc[0]["date"])
+    ##The day is indexed once (by minute, instrument and ATM contract), all the lookups below are on this index
+    chain = OptionChain(df_temp)
+    ##Let's first get the morning and evening price of spot to generate the signal
+    morning_price, evening_price = get_entry_exit_spot(chain, morning_time, evening_time, date_temp)
+    if morning_price is None or evening_price is None:
+        logger.warning(f"Skipping {date_temp} - spot price not found")
+        return dict_signal, None, None
+    ##Now let's add the buy price of CE or PE based on the signal
+    if evening_price > morning_price:
+        dict_signal, instrument, date_trade = dict_signal_buy(chain, dict_signal, "CE", option_entry_time)
+    else:
+        dict_signal, instrument, date_trade = dict_signal_buy(chain, dict_signal, "PE", option_entry_time)
+    ##Now let's add the sell price based on the instrument name and the date_dict of what we bought the previous day
+    if instrumentname is not None and date_dict is not None:
+        dict_signal = dict_signal_sell(chain, option_exit_time, dict_signal, instrumentname, date_dict)
+    return dict_signal, date_trade, instrument
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+"""
+Signature:
+    Inputs:
+        days (Iterable of Dataframes): preprocessed days in date order, for e.g. the generator returned by data_operations.stream_days (could also be a list)
+        dict_signal (Dictioary or TradeLedger): same as in update_dict_signal_day, usually an empty TradeLedger (main.py) or an empty dictionary
+        morning_time/evening_time/option_entry_time/option_exit_time (String): same as in update_dict_signal_day
+        date_dict/instrumentname: Optional arguments - position carried in from before the first day, None by default
+    Output:
+        dict_signal (Dictioary or TradeLedger): Will be returned with date, Instrument, buy and sell price for each date (the same object which was passed in)
+Purpose:
+    Iterative day walk engine - consumes the days one by one (they never need to be in a list) and calls update_dict_signal_day for each
+    Stack usage is constant, so it works the same for 800 days or tens of thousands of days
+"""
+
+def update_dict_signal_stream(days, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_dict=None, instrumentname=None):
+    ##Every fill is priced on its own here, so a reference volume taken from the batch would be the fill's own volume (impact = slippage on every trade)
+    if config.EXECUTION_MODEL == "volume_impact" and execution.reference_volume is None:
+        logger.warning("volume_impact without IMPACT_REFERENCE_VOLUME prices every fill of the loop engine against its own volume, "
+                       "set IMPACT_REFERENCE_VOLUME (or use the vectorized engine) for the same prices as the vectorized engine")
+    for df_temp in days:
+        dict_signal, date_dict, instrumentname = update_dict_signal_day(df_temp, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_dict, instrumentname)
+    return dict_signal
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
 """
 Signature:
     Inputs:
         list_df (List of Dataframes): The df on which we will operate on, should have the same fields as we defined in dict_signal_buy
-        dict_signal
         dict_signal (Dictioary):  which will be of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}} and will be updated for each day
         morning_time/evening_time (String): This is the morning time to process our spot price logic through functino get_entry_exit_spot, should be of type "09:15:00"
         option_entry_time/option_exit_time (String): While this could be same as morning/evening time, this is actually the entry and exit time of our option which we bought and sold the next day
-        date_dict (Datetime Python): The date which will be passed as argument to the dict_signal_sell function which we defined above (basically the previous date on which we bough the option) - should be of type datetime.date(2022, 1, 3)
-            Will be initialised to None and will be modified to the value as defined by calling the function dict_signal_buy
-        instrumentname(String) : The name of instrument which we bought on the previous day
-            Will be initialised to None and will be modified to the value as defined by calling the function dict_signal_buy
-        counter (Int): Just a counter to help us with running recursion, initialised to 0
+        date_dict (Datetime Python): The date of the open position before list_df[counter] - should be of type datetime.date(2022, 1, 3), usually None
+        instrumentname(String) : The name of instrument which is open before list_df[counter], usually None
+        counter (Int): Index of the first day in list_df which we want to process, usually 0
     Output:
         dict_signal (Dictioary): Will be returned with date, Instrument, buy and sell price for each date
 Purpose:
     To loop over a list of dataframes, check if evening price is higher than morning price, if yes, then buy call (else put) at 320, and exit the next day at 916
     Will return a dictionary with different values of dates and corresponding buy and sell prices
+    This used to recurse once per day (and would hit python's recursion limit of 1000 with more data), it is now a thin wrapper over the iterative update_dict_signal_stream
 """
 
 def update_dict_signal(list_df, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_dict, instrumentname, counter):
-    if counter == len(list_df):
-        return dict_signal
-    else:
-        df_temp = list_df[counter]
-        date_temp = str(df_temp.iloc[0]["date"])
-        df_temp.head(1)
-        ##Let's first get the morning and evening price of spot to generate the signal
-        morning_price, evening_price = get_entry_exit_spot(df_temp, morning_time, evening_time, date_temp)
-        
-        if morning_price is None or evening_price is None:  # ADDED
-            logger.warning(f"Skipping {date_temp} - spot price not found")  # CHANGED from print
-            print(f"Skipping {date_temp} - spot price not found")  # ADDED
-            counter += 1  # ADDED
-            return update_dict_signal(list_df, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, None, None, counter)  # ADDED
-        
-        ##Now let's add the buy price of CE or PE based on the signal
-        if evening_price > morning_price:
-            dict_signal, instrument, date_trade = dict_signal_buy(df_temp, dict_signal, "CE", option_entry_time)
-        else:
-            dict_signal, instrument, date_trade = dict_signal_buy(df_temp, dict_signal, "PE", option_entry_time)
-        ##Now let's add the sell price based on the instrument name and the date_dict, and then unpack the tuple for dict, instrument, and date
-        if instrumentname is not None and date_dict is not None:
-            dict_signal = dict_signal_sell(df_temp, option_exit_time, dict_signal, instrumentname, date_dict)
-        ##And not let's call the function recursively, but lets first udpate counter and identify which date and instrument we want to pass
-        counter += 1
-        return update_dict_signal(list_df, dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_trade, instrument, counter)
+    return update_dict_signal_stream(list_df[counter:], dict_signal, morning_time, evening_time, option_entry_time, option_exit_time, date_dict, instrumentname)
         
 
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+"""
+Signature:
+    Inputs:
+        df_all (Pandas DF): all preprocessed days in a single df (for e.g. pd.concat of the days from data_operations.stream_days), with the same fields as we defined in dict_signal_buy plus "spot_open_price"
+        morning_time/evening_time (String): spot times which decide the signal, should be of type "09:16:00"
+        option_entry_time/option_exit_time (String): entry time of the option on the day of the signal and exit time on the next day, should be of type "15:20:00"
+        slippage_pct (Float): Optional argument - overrides config.SLIPPAGE for this call (for e.g. from a parameter sweep), None keeps the config value
+        ledger (TradeLedger): Optional argument - ledger to append the trades to, a new one by default
+        defer_last_day (Boolean): Optional argument - if True no trade is entered on the last day of df_all (it could not be exited within df_all)
+            used by signals_vectorized_stream, which starts the next chunk with that day
+    Output:
+        ledger (TradeLedger): one row per trade in date order, with columns "Date", "Instrument", "Buy Price", "Buy Execution Cost", "Sell Price", "Sell Execution Cost"
+            This is the same data as the dict_signal of update_dict_signal (Sell Price/Sell Execution Cost are NaN where we could not exit), and can be passed directly to results_df
+Purpose:
+    Vectorised version of update_dict_signal - instead of building masks on every day we do the whole dataset in a few joins:
+        1. Pivot the morning/evening spot price per day -> signal per day (CE if evening > morning, else PE), days without either spot row are skipped
+        2. Pick the ATM row of the signal's option type at entry time, from the nearest expiry (next nearest on expiry day), first row per day same as .values[0]
+        3. Shift every buy to the next day in the dataset and join on (next day, instrument) at exit time to get the sell row
+    Both sides are priced in one call each through Execution.price_batch with config.EXECUTION_MODEL (simple_avg gives the same prices as the day walk)
+    Exits are joined first and only the matched ones are priced, so a reference taken from the batch (volume_impact without IMPACT_REFERENCE_VOLUME) is the median of the fills on either side
+    A trade is only exited if the very next day has both spot prices, exactly as the day walk resets its state on a skipped day
+"""
+
+def signals_vectorized(df_all, morning_time, evening_time, option_entry_time, option_exit_time, slippage_pct = None, ledger = None, defer_last_day = False):
+    df = df_all.reset_index(drop=True)
+    ##Time of day of every row as an int (minutes since midnight), so that we compare against the config times without building strings per day
+    if "minute_of_day" in df.columns:
+        time_of_day = df["minute_of_day"].values
+    else:
+        timestamps = pd.to_datetime(df["_timestamp"])
+        time_of_day = ((timestamps - timestamps.dt.normalize()) // pd.Timedelta(minutes=1)).values
+    df_days = pd.DataFrame({"date": np.sort(df["date"].unique())})
+    df_days["next_date"] = df_days["date"].shift(-1)
+    
+    ##Step 1 - spot pivot, first row at each time (same as .values[0] in get_entry_exit_spot)
+    for name, time in [("morning", morning_time), ("evening", evening_time)]:
+        spot = df.loc[time_of_day == data.minute_of_day(time), ["date", "spot_open_price"]].drop_duplicates("date")
+        df_days = df_days.merge(spot.rename(columns={"spot_open_price": f"{name}_price"}).assign(**{f"has_{name}": True}), on="date", how="left")
+    df_days["valid"] = df_days["has_morning"].notna() & df_days["has_evening"].notna()
+    df_days["next_valid"] = df_days["valid"].shift(-1, fill_value=False)
+    if not df_days["valid"].all():
+        logger.warning(f"Skipping {list(df_days.loc[~df_days['valid'], 'date'].dt.date)} - spot price not found")
+    df_days = df_days[df_days["valid"]]
+    df_days["signal"] = np.where(df_days["evening_price"] > df_days["morning_price"], "CE", "PE")
+    
+    ##Step 2 - entry rows, ATM + option type of the day's signal + expiry (nearest, or next nearest on/after the nearest expiry date)
+    entry = df[(time_of_day == data.minute_of_day(option_entry_time)) & (df["Tag"] == "ATM")]
+    ##astype(object) first, as the expiry columns could be categoricals (compact schema) and to_datetime would keep them categorical
+    nearest = pd.to_datetime(entry["nearest_expiry"].astype(object))
+    target_expiry = pd.to_datetime(entry["next_nearest_expiry"].astype(object)).where(~(entry["date"] < nearest), nearest)
+    entry = entry[entry["Expiry"] == target_expiry.dt.strftime("%Y-%m-%d")]
+    entry = entry.merge(df_days[["date", "signal", "next_date", "next_valid"]], left_on=["date", "Option Type"], right_on=["date", "signal"], sort=False)
+    entry = entry.drop_duplicates("date").sort_values("date") ##merge keeps the left order, so the first row per day is the first row in the file
+    if defer_last_day:
+        entry = entry[entry["date"] < df["date"].max()]
+    pricer = execution
+    if slippage_pct is not None:
+        pricer = copy.copy(execution)
+        pricer.slippage_pct = slippage_pct
+    buy_price, buy_execution_cost = _price_fills(pricer, entry, 1)
+    ##Entries go straight into the ledger (exits NaN for now), row i of the ledger is row i of entry
+    if ledger is None:
+        ledger = TradeLedger(capacity = len(entry))
+    first_row = len(ledger)
+    ledger.extend(entry["date"].values, entry["_instrumentname"].values, buy_price, buy_execution_cost)
+    
+    ##Step 3 - exit rows on the next day, joined on (date, instrument), first row per pair, and set on the ledger rows of their entries
+    exit_columns = [column for column in ["date", "_instrumentname", "_open", "_high", "_low", "_close", "_volume"] if column in df.columns]
+    ##Only the exits matching a ledger row are priced, so the volume_impact model (without a reference volume) takes the median volume of the real sells, as for the buys
+    exits = df.loc[time_of_day == data.minute_of_day(option_exit_time), exit_columns].drop_duplicates(["date", "_instrumentname"])
+    df_open = pd.DataFrame({"row": first_row + np.arange(len(entry)), "next_date": entry["next_date"].where(entry["next_valid"]).values, "Instrument": entry["_instrumentname"].values})
+    exits = df_open.merge(exits, left_on=["next_date", "Instrument"], right_on=["date", "_instrumentname"], sort=False)
+    sell_price, sell_execution_cost = _price_fills(pricer, exits, -1)
+    ledger.set_exit(exits["row"].values, sell_price, sell_execution_cost)
+    logger.info(f"Generated {len(entry)} trades, {len(entry) - len(exits)} without an exit")
+    return ledger
+
+##Private helper - prices every row of df_fills (one fill per row) on one side with the configured batched execution model
+##Prices are upcast to float64 first (float32 with the compact schema), so the pricing and the pnl are done in the same precision as the day walk
+def _price_fills(pricer, df_fills, side):
+    volume = df_fills["_volume"].values if "_volume" in df_fills.columns else None
+    open_price, high_price, low_price, close_price = [df_fills[column].to_numpy(dtype=np.float64) for column in ["_open", "_high", "_low", "_close"]]
+    return pricer.price_batch(config.EXECUTION_MODEL, side, open_price, high_price, low_price, close_price, volume)
+
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
+
+"""
+Signature:
+    Inputs:
+        days (Iterable of Dataframes): preprocessed days in date order, for e.g. the generator returned by data_operations.stream_days
+        morning_time/evening_time/option_entry_time/option_exit_time (String): same as in signals_vectorized
+        chunk_days (Int): Optional argument - number of days joined into one df and run through signals_vectorized at a time
+        slippage_pct (Float): Optional argument - same as in signals_vectorized
+    Output:
+        ledger (TradeLedger): same trades as signals_vectorized on all the days at once
+Purpose:
+    To run the vectorized engine on the stream of days without holding all of them in memory, only chunk_days days are joined at any time
+    A trade entered on the last day of a chunk is exited on the first day of the next, so that day is carried over: its entry is deferred to the next chunk, which starts with it
+    With the volume_impact model and no IMPACT_REFERENCE_VOLUME the reference (median volume of the fills) is taken per chunk, all other models price every fill on its own
+"""
+
+def signals_vectorized_stream(days, morning_time, evening_time, option_entry_time, option_exit_time, chunk_days = 250, slippage_pct = None):
+    ledger = TradeLedger()
+    chunk = []
+    for df_day in days:
+        chunk.append(df_day)
+        if len(chunk) > max(int(chunk_days), 1):
+            signals_vectorized(data.concat_days(chunk), morning_time, evening_time, option_entry_time, option_exit_time, slippage_pct = slippage_pct,
+                               ledger = ledger, defer_last_day = True)
+            chunk = chunk[-1:]
+    if chunk:
+        signals_vectorized(data.concat_days(chunk), morning_time, evening_time, option_entry_time, option_exit_time, slippage_pct = slippage_pct, ledger = ledger)
+    return ledger
+
+
 #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------#
 
 """
 Signature:
     Inputs:
         dict_sigal (Dictionary): which was the output from the function update_dict_signal of type {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}}
+            Could also be a TradeLedger (such as the one returned by signals_vectorized) or a df with the TradeLedger columns
     Outputs:
         Will be a new Pandas df called df_trial, which will have the following fields:
             date (Python date): of the form datetime.date(2022, 1, 3)
@@ -241,11 +421,16 @@ Purpose:
 """
 
 def results_df(dict_signal):
-    ##We will first create a new empty DF, and then will loop over the dict_signal to add each row into the df
-    df_trial = pd.DataFrame(columns = ["Date", "Instrument", "Buy Price", "Buy Execution Cost", "Sell Price", "Sell Execution Cost"])
-    for key, value in dict_signal.items():
-        new_row = {"Date": key, "Instrument": value.get("Instrument"), "Buy Price": value.get("Buy Price"), "Buy Execution Cost": value.get("Buy Execution Cost"), "Sell Price": value.get("Sell Price"), "Sell Execution Cost": value.get("Sell Execution Cost")}
-        df_trial = pd.concat([df_trial, pd.DataFrame([new_row])], ignore_index = True)
+    ##We build the trade table through the array backed TradeLedger (one pass over dict_signal) instead of a pd.concat per trade
+    if isinstance(dict_signal, TradeLedger):
+        ledger = dict_signal
+    elif isinstance(dict_signal, pd.DataFrame):
+        ledger = TradeLedger(capacity = len(dict_signal))
+        ledger.extend(*[dict_signal[column].values for column in TradeLedger.COLUMNS])
+    else:
+        ledger = TradeLedger.from_dict_signal(dict_signal)
+    df_trial = ledger.to_frame()
+    df_trial["Date"] = df_trial["Date"].dt.date ##Back to python dates, same as the keys of dict_signal
     
     ##Filter out incomplete trades (where Sell Price is None)  # ADDED
     initial_rows = len(df_trial)  # ADDED
@@ -277,6 +462,7 @@ Signature:
         onitial_capital (Float): The initial capital with which we started the trading
         rpt (float): represents % of initial capital which we will risk per day (Acronym for risk per trade)
         file_path ("String") : represents the directory in which we want to store the output 
+        save (Boolean): Optional argument - whether to write the results csv, True by default (the sweep turns it off, it only needs the df)
     Outputs:
         df_results (Pandas DF): Transformed input DF, with the following fields:
             date (Python date): of the form datetime.date(2022, 1, 3)
@@ -288,14 +474,15 @@ Signature:
 Purpose: To transform input pandas df by adding the actual pnl bassed on the initial capittal and defined rpt , we will also drop _pct columns to keep things simple and readable 
 """
 
-def results_final(df_results, initial_capital, rpt, file_path):
+def results_final(df_results, initial_capital, rpt, file_path, save = True):
     ##Fairly easy just adding some new columns and dropping original columns
     risk_per_trade = rpt*initial_capital
     df_results["gross_pnl"] = df_results["gross_pct"]*risk_per_trade
     df_results["execution_pnl"] = df_results["execution_pct"]*risk_per_trade
     df_results["net_pnl"] = df_results["net_pct"]*risk_per_trade
     df_results.drop(columns = ["gross_pct", "execution_pct", "net_pct"], inplace = True)    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = os.path.join(file_path, f"results_{timestamp}.csv")
-    df_results.to_csv(output_file, index=False, header=True, sep=",", encoding='utf-8' )
+    if save:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(file_path, f"results_{timestamp}.csv")
+        df_results.to_csv(output_file, index=False, header=True, sep=",", encoding='utf-8' )
     return df_results
\ No newline at end of file
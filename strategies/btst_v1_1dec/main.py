@@ -7,7 +7,6 @@ import os
 import numpy as np
 from functools import reduce ##reduce will help us club multiple filters together
 import operator
-import matplotlib.pyplot as plt
 import logging
 
 ##Defining paths to download our own common libs
@@ -18,81 +17,108 @@ sys.path.insert(0, os.path.abspath(src_path))
 ##Now importing all of our common libraries for usage
 from execution import Execution
 import data_operations as data
+from spot_store import SpotStore
 from analytics import Metrics
+from ledger import TradeLedger
 import config 
 import logic
 
 
-##Now let's setup our logger
-os.makedirs(config.LOG_DIR, exist_ok=True)  # Use from config
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),  # Convert string to logging level
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%H:%M:%S',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(os.path.join(config.LOG_DIR, f'run_{timestamp}.log'))  # Use from config
-    ]
-)
+##Now let's setup our logger, handlers are only added when main() runs (and not on import), so worker processes which import this module do not open log files of their own
 logger = logging.getLogger(__name__)
 
+##log_name prefixes the log file, main_sweep.py uses the same setup with "sweep"
+def setup_logging(log_name="run"):
+    os.makedirs(config.LOG_DIR, exist_ok=True)  # Use from config
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),  # Convert string to logging level
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%H:%M:%S',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(os.path.join(config.LOG_DIR, f'{log_name}_{timestamp}.log'))  # Use from config
+        ]
+    )
+
+#--------------------------------------------------------------PREPARING THE DATA-----------------------------------------------------------------------------------#
+"""
+Signature:
+    Inputs: None, everything comes from config.py (DATA_FORMAT, paths, INCREMENTAL_INGEST, split/store settings)
+    Outputs:
+        list_expiries (List): output of data.load_expiries
+        day_sources (List): the days to load in date order - file paths of the smaller files, or dates of the parquet store
+        catalog_dir (String): folder holding the expiry catalog (and the spot store), the parquet store or the smaller files folder
+Purpose: To run steps 1 to 3, shared by main.py and main_sweep.py, so the store/smaller files build and the incremental ingest live in one place
+"""
+def prepare_data():
+    ##Step 1 - Let's first create smaller files (or the parquet store) from big file, if the folder doesn't exist already, we will create this folder in the data/Nifty folder
+    if config.DATA_FORMAT == "parquet":
+        if not os.path.exists(config.PATH_STORE):
+            logger.info("Creating parquet store...")
+            data.data_breakdown_store(config.PATH_LARGE_FILE, config.DATE_COLUMN_NAME, from_date = config.START_DATE, dirname = config.STORE_DIRNAME,
+                                      chunk_size = config.SPLIT_CHUNK_SIZE, row_group_minutes = config.STORE_ROW_GROUP_MINUTES)
+        elif config.INCREMENTAL_INGEST:
+            data.ingest_store(config.PATH_LARGE_FILE, config.DATE_COLUMN_NAME, config.PATH_STORE, from_date = config.START_DATE,
+                              chunk_size = config.SPLIT_CHUNK_SIZE, row_group_minutes = config.STORE_ROW_GROUP_MINUTES)
+    elif not os.path.exists(config.PATH_SMALLER_FILES):
+        logger.info("Creating smaller files...")
+        data.data_breakdown(config.PATH_LARGE_FILE, config.DATE_COLUMN_NAME, from_date = config.START_DATE, filename = config.DIRNAME,
+                            chunk_size = config.SPLIT_CHUNK_SIZE, num_writers = config.SPLIT_WRITERS)
+    elif config.INCREMENTAL_INGEST and not data.is_catalog_fresh(config.PATH_LARGE_FILE, config.INSTRUMENT_COLUMN_NAME, config.PATH_SMALLER_FILES):
+        logger.info("Source has changed, adding the new days to the smaller files...")
+        data.data_breakdown(config.PATH_LARGE_FILE, config.DATE_COLUMN_NAME, from_date = config.START_DATE, filename = config.DIRNAME,
+                            chunk_size = config.SPLIT_CHUNK_SIZE, num_writers = config.SPLIT_WRITERS)
+    ##Step 2- Let's now load the list of expiries from the expiry catalog (built during step 1, or rebuilt here if the big file has changed)
+    catalog_dir = config.PATH_STORE if config.DATA_FORMAT == "parquet" else config.PATH_SMALLER_FILES
+    list_expiries = data.load_expiries(config.PATH_LARGE_FILE, config.INSTRUMENT_COLUMN_NAME, catalog_dir)
+    ##Step 3 - Lets list all the days which we want to load (file paths of the smaller files, or days in the parquet store), sorted by date
+    if config.DATA_FORMAT == "parquet":
+        day_sources = data.list_store_dates(config.PATH_STORE)
+    else:
+        day_sources = sorted(os.path.join(config.PATH_SMALLER_FILES, f) for f in os.listdir(config.PATH_SMALLER_FILES) if f.endswith('.csv'))
+    return list_expiries, day_sources, catalog_dir
+
 #--------------------------------------------------------------DEFINING MAIN FUNCTION NOW-----------------------------------------------------------------------------------#
 def main():
+    setup_logging()
     ##Starting our logic with a log
     logger.info(f"Starting: {config.STRATEGY_NAME}")
     ##Let's write all the steps and then run those one by  one
-    ##Step 1 - Let's first create smaller files from big file, if smaller files folder doesn't exist already, we will create this folder in the data/Nifty folder
-    if not os.path.exists(config.PATH_SMALLER_FILES):
-        logger.info("Creating smaller files...")
-        data.data_breakdown(config.PATH_LARGE_FILE, config.DATE_COLUMN_NAME, from_date = config.START_DATE, filename = config.DIRNAME)
-    ##Step 2- Let's now generate the list of expiries from the data we have already
-    list_expiries = data.get_expiries(config.PATH_LARGE_FILE, config.INSTRUMENT_COLUMN_NAME)
-    ##Step 3 - Lets load all the smaller files which we created in a list of strings (list will only store the filne names) 
-    csv_files = [f for f in os.listdir(config.PATH_SMALLER_FILES) if f.endswith('.csv')]
-    csv_files.sort()
-    ##Step 4 - Then we will load all the files in a dataframe - all 700 files to be loaded as dataframe in a list
-    logger.info(f"Loading {len(csv_files)} CSV files...")
-    list_df = [] ##List of dataframes which will load all the smaller files on to it
-    for i in csv_files:
-        list_df.append(pd.read_csv(os.path.join(config.PATH_SMALLER_FILES, i)))
-    ##Step 5 - For the sake of efficiency , we will drop any row which is not 916 or 320
-    list_df_drop_timestamps = [] ##Creating a new list of df which will store the list of df in which we have dropped all rows except that of 916 and 320
-    for i in list_df:
-        list_df_drop_timestamps.append(data.drop_timestamp_rows(
-            i, 
-            config.DATE_COLUMN_NAME, 
-            config.LIST_TIMESTAMPS)) 
-    print(list_df_drop_timestamps[2].shape)
-    ##Step 6 - Now we will map nearest and next nearest expiry for each of the rows in our dataframe, this is also the step where we add the "date" column to our dataframses
-    list_df_add_expiry = [] ## A new list of df, which will store all our df, but where we have mapped nearest and next nearest expiry
-    for i in list_df_drop_timestamps:
-        list_df_add_expiry.append(data.add_nearest_next_nearest_expiry(i, list_expiries, config.DATE_COLUMN_NAME))
-
-    ##Step 7 - We will now map the spot price for each row in our dataframe
-    df_spot = pd.read_csv(config.PATH_NIFTY_SPOT)
-    list_df_add_spot = [] ## another list of df, which will have another column added - mapping of spot price
-    for i in list_df_add_expiry:
-        list_df_add_spot.append(data.add_spot_price(i, df_spot, config.DATE_COLUMN_NAME, config.DATE_COLUMN_NAME_NEW, open=True))
-
-    ##Step 8 - We will now add a new column Tag, which will add the tag of ATM to the row which has the ATM strike for our dataframe
-    list_df_add_atm = []
-    for i in list_df_add_spot:
-        list_df_add_atm.append(data.add_ATM_tag_vs_spot(i, config.THRESHOLD, config.COLUMN_SPOT_PRICE_NAME, config.COLUMN_STRIKE_NAME))
+    list_expiries, day_sources, catalog_dir = prepare_data()
+    ##Step 4 to 8 - Then we will stream every day through the preprocessing chain (in a process pool), days come out in date order and only a few are in memory at once
+        ##Step 5 - For the sake of efficiency , we will drop any row which is not 916 or 320
+        ##Step 6 - Map nearest and next nearest expiry for each of the rows, this is also the step where we add the "date" column to our dataframes
+        ##Step 7 - Map the (open) spot price for each row
+        ##Step 8 - Add a new column Tag, which will add the tag of ATM to the row which has the ATM strike
+    logger.info(f"Loading {len(day_sources)} days...")
+    ##Spot file is parsed and indexed once (and persisted next to the expiry catalog), workers only do lookups on it
+    spot_store = SpotStore.load_or_build(config.PATH_NIFTY_SPOT, catalog_dir, config.DATE_COLUMN_NAME_NEW)
+    days = data.stream_days(day_sources, list_expiries, spot_store, config.DATE_COLUMN_NAME, config.DATE_COLUMN_NAME_NEW, config.LIST_TIMESTAMPS,
+                            config.THRESHOLD, config.COLUMN_SPOT_PRICE_NAME, config.COLUMN_STRIKE_NAME, spot_fields = ["open"],
+                            store_path = config.PATH_STORE if config.DATA_FORMAT == "parquet" else None, num_workers = config.NUM_WORKERS, compact = config.COMPACT_SCHEMA,
+                            pushdown_times = config.PUSHDOWN_TIMES, strike_window = config.STRIKE_WINDOW, strike_step = config.STRIKE_STEP,
+                            atm_selection = config.ATM_SELECTION)
 
-    ##Step 9 - We will now run our logic (if evening price > morning price buy ce else pe) to generate a dict of type - {date: {"Instrument": xxxyyy, "Buy Price": 1122.3, "Sell Price": 2232,4, "Buy Execution Cost": 2.2, "Sell Execution Cost": 3.2}}
+    ##Step 9 - We will now run our logic (if evening price > morning price buy ce else pe) on the stream of days, every trade goes into a TradeLedger with columns - Date, Instrument, Buy Price, Buy Execution Cost, Sell Price, Sell Execution Cost
     logger.info("Generating signals...")
-    dict_signal = {} ## An empy dictionary to pass as param to our main function
-    dict_final = logic.update_dict_signal(list_df_add_atm, dict_signal, config.MORNING_TIME, config.EVENING_TIME, config.OPTION_ENTRY_TIME, config.OPTION_EXIT_TIME, None, None, 0)
-    logger.info(f"Generated {len(dict_final)} signals")
-    ##Step 10 - Let;s now transform our dictionary into a dataframe with pct values
-    df_results = logic.results_df(dict_final) ##in this df_results we store data in pct form
+    if config.SIGNAL_ENGINE == "vectorized":
+        ##Days are still streamed, the vectorized engine joins SIGNAL_CHUNK_DAYS of them at a time (same trades as all days at once)
+        ledger = logic.signals_vectorized_stream(days, config.MORNING_TIME, config.EVENING_TIME, config.OPTION_ENTRY_TIME, config.OPTION_EXIT_TIME,
+                                                 chunk_days = config.SIGNAL_CHUNK_DAYS)
+    else:
+        ##An empty trade ledger, the day walk appends every entry to it and sets the exit on the same row the next day
+        ledger = logic.update_dict_signal_stream(days, TradeLedger(), config.MORNING_TIME, config.EVENING_TIME, config.OPTION_ENTRY_TIME, config.OPTION_EXIT_TIME)
+    logger.info(f"Generated {len(ledger)} signals")
+    ##Step 10 - Let;s now transform our trade ledger into a dataframe with pct values
+    df_results = logic.results_df(ledger) ##in this df_results we store data in pct form
     ##Step 11 - Now let's transform our dataframe from previous step to host absolute pnl values based on risk per trade and initial capital
     df_results = logic.results_final(df_results, config.INITIAL_CAPITAL, config.RPT,config.RESULTS_FINAL_PATH)
     ##Step 12 - Finally let's use the analytics library to generate our finished pdf
     logger.info("Generating report...")
     metrics = Metrics(df_results, config.INITIAL_CAPITAL)
-    metrics.generate_report( strategy = config.STRATEGY_NAME, logic = config.LOGIC, return_type = config.RETURN_TYPE, file_path = config.RESULTS_FINAL_PATH, filename= config.REPORT_NAME )
+    metrics.generate_report( strategy = config.STRATEGY_NAME, logic = config.LOGIC, return_type = config.RETURN_TYPE, file_path = config.RESULTS_FINAL_PATH, filename= config.REPORT_NAME,
+                             rolling_window = config.ROLLING_WINDOW, chart_format = config.REPORT_CHART_FORMAT)
     logger.info(f"Done! Report: {config.REPORT_NAME}")
     return
 
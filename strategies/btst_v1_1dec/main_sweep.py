@@ -0,0 +1,137 @@
+##Importing the relevant libraries/packages
+import pandas as pd
+import sys
+import os
+import logging
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener
+
+##Defining paths to download our own common libs
+current_file = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_file, '..', '..', 'src')
+sys.path.insert(0, os.path.abspath(src_path))
+
+##Now importing all of our common libraries for usage
+import data_operations as data
+from spot_store import SpotStore
+import sweep
+from analytics import generate_reports
+import config
+import logic
+from main import setup_logging, prepare_data
+
+
+##Now let's setup our logger, handlers are only added in the parent (in main) and not on import, so worker processes which import this module do not open log files of their own
+##Sweep workers send their records back to the parent through a queue instead (see _init_sweep_worker)
+logger = logging.getLogger(__name__)
+
+##Config values a sweep can vary, every combination carries all of them (the ones not in SWEEP_PARAMS at their config.py value)
+##so that rows of different sweeps in the same results file line up and a combination is recognised when resuming
+SWEEPABLE_PARAMS = ["THRESHOLD", "MORNING_TIME", "EVENING_TIME", "OPTION_ENTRY_TIME", "OPTION_EXIT_TIME", "SLIPPAGE", "RPT"]
+
+#--------------------------------------------------------------WORKER SIDE OF THE SWEEP-----------------------------------------------------------------------------------#
+##State is set once per worker process by the pool initializer, so the preprocessed data is sent to every worker once and not once per combination
+_SWEEP_STATE = {}
+
+def _init_sweep_worker(df_all, log_queue=None):
+    _SWEEP_STATE.update(df_all=df_all, tagged={})
+    ##In a worker process every record goes onto log_queue, and the parent's QueueListener hands it to the parent's handlers (one process writes the log file)
+    ##When the sweep runs in the parent itself (1 worker) its handlers are left as they are
+    if log_queue is not None and multiprocessing.parent_process() is not None:
+        root_logger = logging.getLogger()
+        root_logger.handlers = [QueueHandler(log_queue)]
+        root_logger.setLevel(getattr(logging, config.LOG_LEVEL))
+    ##Worker processes should not flood the console with the per trade logs of every combination
+    logging.getLogger("logic").setLevel(logging.WARNING)
+
+"""
+Signature:
+    Inputs:
+        params (Dictionary): one combination with a value for every SWEEPABLE_PARAMS, such as {"THRESHOLD": 25, "MORNING_TIME": "09:16:00", ... , "SLIPPAGE": 0.01, "RPT": 0.01}
+    Outputs:
+        df_results (Pandas DF): output of logic.results_final for the combination
+Purpose: To run steps 8 to 11 of main.py (ATM tag, signals, results) for one combination on the data which was loaded once
+"""
+def backtest(params):
+    ##Step 8 - the ATM tag is the only preprocessing step which depends on a parameter, so we redo it per threshold (once per worker)
+    ##With ATM_SELECTION "nearest" the tag from loading does not depend on THRESHOLD, so it is kept as it is
+    if config.ATM_SELECTION == "nearest":
+        _SWEEP_STATE["tagged"].setdefault(params["THRESHOLD"], _SWEEP_STATE["df_all"])
+    if params["THRESHOLD"] not in _SWEEP_STATE["tagged"]:
+        df_tagged = data.add_ATM_tag_vs_spot(_SWEEP_STATE["df_all"].copy(deep=False), params["THRESHOLD"], config.COLUMN_SPOT_PRICE_NAME, config.COLUMN_STRIKE_NAME)
+        _SWEEP_STATE["tagged"][params["THRESHOLD"]] = data.enforce_schema(df_tagged, {"Tag": data.COMPACT_SCHEMA["Tag"]}) if config.COMPACT_SCHEMA else df_tagged
+    df_all = _SWEEP_STATE["tagged"][params["THRESHOLD"]]
+    ##Step 9 to 11 - same as main.py, without writing the results csv
+    ledger = logic.signals_vectorized(df_all, params["MORNING_TIME"], params["EVENING_TIME"], params["OPTION_ENTRY_TIME"], params["OPTION_EXIT_TIME"],
+                                      slippage_pct = params["SLIPPAGE"])
+    return logic.results_final(logic.results_df(ledger), config.INITIAL_CAPITAL, params["RPT"], config.RESULTS_FINAL_PATH, save = False)
+
+"""
+Signature:
+    Inputs:
+        params (Dictionary): same as backtest
+    Outputs:
+        headline (Dictionary): output of sweep.metrics_headline for the combination
+Purpose: To run steps 8 to 12 of main.py for one combination, with the headline numbers instead of the pdf report
+"""
+def evaluate(params):
+    return sweep.metrics_headline(backtest(params), config.INITIAL_CAPITAL, config.SWEEP_RETURN_TYPE)
+
+#--------------------------------------------------------------DEFINING MAIN FUNCTION NOW-----------------------------------------------------------------------------------#
+def main():
+    setup_logging("sweep")
+    logger.info(f"Starting sweep: {config.STRATEGY_NAME}")
+    unknown = [name for name in config.SWEEP_PARAMS if name not in SWEEPABLE_PARAMS]
+    if unknown:
+        logger.error(f"Cannot sweep {unknown}, SWEEP_PARAMS keys must be in {SWEEPABLE_PARAMS}")
+        raise ValueError(f"Cannot sweep {unknown}, SWEEP_PARAMS keys must be in {SWEEPABLE_PARAMS}")
+    ##Step 1 to 3 - same as main.py, the parquet store (or smaller files), the expiry list and the days to load
+    list_expiries, day_sources, catalog_dir = prepare_data()
+    ##Step 4 to 8 - preprocess once, keeping every time any combination needs (the ATM tag is redone per threshold inside evaluate)
+    time_params = ["MORNING_TIME", "EVENING_TIME", "OPTION_ENTRY_TIME", "OPTION_EXIT_TIME"]
+    list_timestamps = sorted(set(config.LIST_TIMESTAMPS) | {getattr(config, name) for name in time_params}
+                             | {time for name in time_params for time in config.SWEEP_PARAMS.get(name, [])})
+    logger.info(f"Loading {len(day_sources)} days at {list_timestamps}...")
+    ##Spot file is parsed and indexed once (and persisted next to the expiry catalog), workers only do lookups on it
+    spot_store = SpotStore.load_or_build(config.PATH_NIFTY_SPOT, catalog_dir, config.DATE_COLUMN_NAME_NEW)
+    days = data.stream_days(day_sources, list_expiries, spot_store, config.DATE_COLUMN_NAME, config.DATE_COLUMN_NAME_NEW, list_timestamps,
+                            config.THRESHOLD, config.COLUMN_SPOT_PRICE_NAME, config.COLUMN_STRIKE_NAME, spot_fields = ["open"],
+                            store_path = config.PATH_STORE if config.DATA_FORMAT == "parquet" else None, num_workers = config.NUM_WORKERS, compact = config.COMPACT_SCHEMA,
+                            pushdown_times = config.PUSHDOWN_TIMES, strike_window = config.STRIKE_WINDOW, strike_step = config.STRIKE_STEP,
+                            atm_selection = config.ATM_SELECTION)
+    df_all = data.concat_days(days)
+    logger.info(f"Loaded {len(df_all)} rows in {data.memory_report(df_all).loc['Total', 'MB']:.1f} MB")
+    ##Step 9 to 12 - fan the combinations out over the process pool, every finished combination is appended to SWEEP_RESULTS_FILE
+    if config.SWEEP_MODE == "random":
+        combinations = sweep.parameter_random(config.SWEEP_PARAMS, config.SWEEP_SAMPLES, seed = config.SWEEP_SEED)
+    else:
+        combinations = sweep.parameter_grid(config.SWEEP_PARAMS)
+    defaults = {name: getattr(config, name) for name in SWEEPABLE_PARAMS}
+    combinations = [{**defaults, **params} for params in combinations]
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level = True)
+    listener.start()
+    try:
+        df_sweep = sweep.run_sweep(evaluate, combinations, config.SWEEP_RESULTS_FILE, num_workers = config.NUM_WORKERS,
+                                   initializer = _init_sweep_worker, initargs = (df_all, log_queue))
+    finally:
+        listener.stop() ##Writes out whatever the workers logged last
+    if len(df_sweep) > 0:
+        logger.info("Top combinations by sharpe:\n" + df_sweep.sort_values("sharpe_ratio", ascending = False).head(5).drop(columns = ["key"]).to_string(index = False))
+    ##Step 12 - full reports for the best combinations only, backtests are rerun here (they take milliseconds) and the reports are rendered in parallel
+    if config.SWEEP_REPORTS_TOP > 0 and len(df_sweep) > 0:
+        _init_sweep_worker(df_all)
+        jobs = []
+        for rank, row in enumerate(df_sweep.sort_values("sharpe_ratio", ascending = False).head(config.SWEEP_REPORTS_TOP).to_dict("records"), start = 1):
+            params = {name: row[name] for name in SWEEPABLE_PARAMS}
+            jobs.append({"df_results": backtest(params), "initial_capital": config.INITIAL_CAPITAL, "strategy": f"{config.STRATEGY_NAME} #{rank}",
+                         "return_type": config.SWEEP_RETURN_TYPE, "logic": sweep.combination_key(params), "file_path": config.RESULTS_FINAL_PATH,
+                         "filename": f"{config.STRATEGY_NAME}_sweep_top{rank}.pdf", "rolling_window": config.ROLLING_WINDOW, "chart_format": config.REPORT_CHART_FORMAT})
+        df_timings = generate_reports(jobs, num_workers = config.NUM_WORKERS)
+        logger.info(f"Reports of the top {len(jobs)} combinations: {df_timings['pdf_path'].tolist()}")
+    logger.info(f"Done! Sweep results: {config.SWEEP_RESULTS_FILE}")
+    return df_sweep
+
+
+if __name__ == "__main__":
+    main()